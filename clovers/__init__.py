@@ -5,7 +5,7 @@ __description__ = "高度自定义的聊天平台 Python 异步机器人指令-
 
 from .base import Result, Event, Adapter, EventType
 from .plugin import Handle, TempHandle, Plugin
-from .core import AdapterCore, PluginLoader, CloversCore, CloversMultiCore
+from .core import AdapterCore, PluginLoader, CloversCore, CloversMultiCore, CloversShardedCore
 
 
 __all__ = [
@@ -20,4 +20,5 @@ __all__ = [
     "PluginLoader",
     "CloversCore",
     "CloversMultiCore",
+    "CloversShardedCore",
 ]
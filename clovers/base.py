@@ -1,7 +1,10 @@
+import asyncio
 from functools import wraps
+from operator import itemgetter
 from abc import ABC, abstractmethod
 from typing import Any, Protocol
-from collections.abc import Callable, Coroutine, Iterable, Sequence
+from collections.abc import Callable, Coroutine, Hashable, Iterable, Sequence
+from .cache import CachedMethod
 
 type Coro[T] = Coroutine[Any, Any, T]
 type AdapterMethod[T] = Callable[..., Coro[T]]
@@ -10,25 +13,84 @@ type Task = Callable[[], Coro[None] | None]
 type EventHandler = Callable[[Event], Coro[Result | None]]
 
 
+def kwnames(func: Callable) -> tuple[str, ...] | None:
+    """获取方法可以通过关键字传入的参数名
+
+    Args:
+        func (Callable): 方法
+
+    Returns:
+        tuple[str, ...] | None: 参数名，方法接受任意关键字参数时返回 None
+    """
+    code = func.__code__
+    if code.co_flags & 0x08:
+        return None
+    return code.co_varnames[code.co_posonlyargcount : code.co_argcount + code.co_kwonlyargcount]
+
+
+def _projector(names: tuple[str, ...]) -> Callable[[dict], tuple]:
+    if not names:
+        return lambda kwargs: ()
+    if len(names) == 1:
+        name = names[0]
+        return lambda kwargs: (kwargs[name],)
+    return itemgetter(*names)
+
+
 def kwfilter(func: AdapterMethod) -> AdapterMethod:
-    """方法参数过滤器"""
+    """方法参数过滤器
+
+    注册时解析方法需要的额外参数，调用时按位置取出这些参数传入，不需要遍历全部额外参数。
+
+    缺少参数时退回按名称过滤，以便使用参数默认值。
+    """
 
-    if func.__code__.co_flags & 0x0C:
+    code = getattr(func, "__code__", None)
+    if code is None or code.co_flags & 0x0C:
         return func
-    co_argcount = func.__code__.co_argcount
-    if co_argcount == 0:
+    argcount = code.co_argcount
+    names = code.co_varnames[: argcount + code.co_kwonlyargcount]
+    if not names:
         return wraps(func)(lambda *args, **kwargs: func())
-    kw = set(func.__code__.co_varnames[:co_argcount])
+    posonly = code.co_posonlyargcount
+    kwonly = names[argcount:]
+    getters = [_projector(names[n:argcount]) for n in range(argcount + 1)]
+
+    def fallback(args: tuple, kwargs: dict):
+        return func(*args, **{k: kwargs[k] for k in names[max(len(args), posonly) :] if k in kwargs})
 
     @wraps(func)
     def wrapper(*args, **kwargs):
-        return func(*args, **{k: v for k, v in kwargs.items() if k in kw})
+        try:
+            values = getters[len(args)](kwargs)
+        except (KeyError, IndexError):
+            return fallback(args, kwargs)
+        if kwonly:
+            return func(*args, *values, **{k: kwargs[k] for k in kwonly if k in kwargs})
+        return func(*args, *values)
 
     return wrapper
 
 
+def cached(func: AdapterMethod, ttl: float, maxsize: int = 1024, key: Callable[..., Hashable] | None = None) -> CachedMethod:
+    """构建带缓存的适配器调用方法
+
+    Args:
+        func (AdapterMethod): 调用方法
+        ttl (float): 缓存过期时间
+        maxsize (int): 最大缓存条目数
+        key (Callable[..., Hashable] | None): 根据方法参数计算缓存键
+
+    Returns:
+        CachedMethod: 带缓存的调用方法
+    """
+    return CachedMethod(kwfilter(func), kwnames(func), ttl, maxsize, key and kwfilter(key))
+
+
 class Info(ABC):
 
+    __slots__ = ()
+
     @property
     @abstractmethod
     def info(self) -> dict[str, Any]:
@@ -45,10 +107,12 @@ class Adapter(Info):
     Attributes:
         sends_lib (AdapterMethodLib): 发送方法
         calls_lib (AdapterMethodLib): 调用方法
+        batch_sends_lib (AdapterMethodLib): 批量发送方法
     """
 
     sends_lib: AdapterMethodLib[None]
     calls_lib: AdapterMethodLib[Any]
+    batch_sends_lib: AdapterMethodLib[None]
 
     def __init__(self, name: str = "") -> None:
         self.name: str = name
@@ -57,6 +121,8 @@ class Adapter(Info):
         """发送方法库"""
         self.calls_lib = {}
         """调用方法库"""
+        self.batch_sends_lib = {}
+        """批量发送方法库"""
 
     @property
     def info(self):
@@ -66,23 +132,37 @@ class Adapter(Info):
             "calls_lib": list(self.calls_lib.keys()),
         }
 
-    def register_call[T: AdapterMethod](self, method_name: str, func: T) -> T:
-        self.calls_lib[method_name] = kwfilter(func)
+    def register_call[T: AdapterMethod](
+        self,
+        method_name: str,
+        func: T,
+        ttl: float = 0,
+        maxsize: int = 1024,
+        key: Callable[..., Hashable] | None = None,
+    ) -> T:
+        self.calls_lib[method_name] = cached(func, ttl, maxsize, key) if ttl > 0 else kwfilter(func)
         return func
 
     def register_send[T: AdapterMethod[None]](self, method_name: str, func: T) -> T:
         self.sends_lib[method_name] = kwfilter(func)
         return func
 
-    def property_method(self, method_name: str):
+    def register_batch_send[T: AdapterMethod[None]](self, method_name: str, func: T) -> T:
+        self.batch_sends_lib[method_name] = kwfilter(func)
+        return func
+
+    def property_method(self, method_name: str, ttl: float = 0, maxsize: int = 1024, key: Callable[..., Hashable] | None = None):
         """添加一个获取参数方法
 
         Args:
             method_name (str): 方法名
+            ttl (float): 缓存过期时间，为 0 时不缓存
+            maxsize (int): 最大缓存条目数
+            key (Callable[..., Hashable] | None): 根据方法参数计算缓存键，默认使用方法实际需要的参数
         Returns:
             (AdapterMethod) -> AdapterMethod: 属性方法装饰器
         """
-        return lambda func: self.register_call(method_name, func)
+        return lambda func: self.register_call(method_name, func, ttl, maxsize, key)
 
     def send_method(self, method_name: str):
         """添加一个发送消息方法
@@ -94,15 +174,49 @@ class Adapter(Info):
         """
         return lambda func: self.register_send(method_name, func)
 
-    def call_method(self, method_name: str):
+    def batch_send_method(self, method_name: str):
+        """添加一个批量发送消息方法
+
+        批量发送方法与同名发送方法对应，第一个参数为消息列表，只在启用发送队列时使用
+
+        Args:
+            method_name (str): 方法名
+        Returns:
+            (AdapterMethod) -> AdapterMethod: 批量发送方法装饰器
+        """
+        return lambda func: self.register_batch_send(method_name, func)
+
+    def call_method(self, method_name: str, ttl: float = 0, maxsize: int = 1024, key: Callable[..., Hashable] | None = None):
         """添加一个调用方法
 
         Args:
             method_name (str): 方法名
+            ttl (float): 缓存过期时间，为 0 时不缓存
+            maxsize (int): 最大缓存条目数
+            key (Callable[..., Hashable] | None): 根据方法参数计算缓存键，默认使用方法实际需要的参数
         Returns:
             (AdapterMethod) -> AdapterMethod: 调用方法装饰器
         """
-        return lambda func: self.register_call(method_name, func)
+        return lambda func: self.register_call(method_name, func, ttl, maxsize, key)
+
+    def cache_info(self) -> dict[str, dict]:
+        """获取调用方法的缓存统计"""
+        return {k: func.cache.info for k, func in self.calls_lib.items() if isinstance(func, CachedMethod)}
+
+    def invalidate(self, method_name: str | None = None, *args, **extra):
+        """删除调用方法的缓存
+
+        Args:
+            method_name (str | None): 方法名，为 None 时清空全部缓存
+            *args: 方法的位置参数，与 extra 都不传时清空该方法的全部缓存
+            **extra: 额外的参数
+        """
+        if method_name is None:
+            for func in self.calls_lib.values():
+                if isinstance(func, CachedMethod):
+                    func.invalidate()
+        elif isinstance(func := self.calls_lib.get(method_name), CachedMethod):
+            func.invalidate(*args, **extra)
 
     def mixin(self, adapter: "Adapter"):
         """混合其他兼容方法
@@ -114,6 +228,58 @@ class Adapter(Info):
             self.register_send(k, func)
         for k, func in adapter.calls_lib.items():
             self.register_call(k, func)
+        for k, func in adapter.batch_sends_lib.items():
+            self.register_batch_send(k, func)
+
+
+class EventProperties(dict[str, Any]):
+    """事件属性
+
+    同一事件的全部响应器共享，同一个属性只会向适配器获取一次，并发获取时等待同一个请求。
+    """
+
+    __slots__ = ("_pending",)
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._pending: dict[str, asyncio.Future] = {}
+
+    def _request(self, keys: Iterable[str], calls_lib: AdapterMethodLib, extra: dict):
+        waiting: dict[str, asyncio.Future] = {}
+        for key in keys:
+            if key in self:
+                continue
+            if (future := self._pending.get(key)) is None:
+                future = self._pending[key] = asyncio.ensure_future(calls_lib[key](**extra))
+            waiting[key] = future
+        return waiting
+
+    def prefetch(self, keys: Iterable[str], calls_lib: AdapterMethodLib, extra: dict):
+        """开始获取缺失的属性，不等待结果
+
+        Args:
+            keys (Iterable[str]): 需要的属性
+            calls_lib (AdapterMethodLib): 适配器调用方法
+            extra (dict): 适配器需要的额外参数
+        """
+        for future in self._request(keys, calls_lib, extra).values():
+            # 预取的属性可能没有响应器等待，需要取出异常避免警告
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+    async def fetch(self, keys: Iterable[str], calls_lib: AdapterMethodLib, extra: dict):
+        """获取缺失的属性
+
+        Args:
+            keys (Iterable[str]): 需要的属性
+            calls_lib (AdapterMethodLib): 适配器调用方法
+            extra (dict): 适配器需要的额外参数
+        """
+        if not (waiting := self._request(keys, calls_lib, extra)):
+            return
+        # 使用 wait 而不是 gather，单个响应器被取消时不会取消共享的请求
+        await asyncio.wait(waiting.values())
+        for key, future in waiting.items():
+            self[key] = future.result()
 
 
 class EventType(Protocol):
@@ -135,25 +301,72 @@ class EventType(Protocol):
     def call(self, key: str, *args) -> Coro[Any] | None: ...
 
 
+class EventContext:
+    """同一条消息的全部事件共享的数据
+
+    Attributes:
+        message (str): 触发插件的消息原文
+        properties (dict[str, Any]): 需要的额外属性，由插件声明
+        adapter (Adapter): 适配器
+        extra (dict): 适配器需要的额外参数
+    """
+
+    __slots__ = ("message", "properties", "adapter", "extra")
+
+    def __init__(self, message: str, properties: dict[str, Any], adapter: Adapter, extra: dict):
+        self.message = message
+        self.properties = properties
+        self.adapter = adapter
+        self.extra = extra
+
+
 class Event(Info):
     """触发响应的事件
 
+    同一条消息的事件共享 EventContext，每个事件只保存自己的指令参数
+
     Attributes:
         message (str): 触发插件的消息原文
         args (Sequence[str]): 指令参数
         properties (dict[str, Any]): 需要的额外属性，由插件声明
     """
 
-    message: str
+    __slots__ = ("_context", "args")
+
     args: Sequence[str]
-    properties: dict
 
     def __init__(self, message: str, args: Sequence[str], properties: dict[str, Any], adapter: Adapter, extra: dict):
-        self.message = message
+        self._context = EventContext(message, properties, adapter, extra)
         self.args = args
-        self.properties = properties
-        self._adapter = adapter
-        self._extra = extra
+
+    @classmethod
+    def from_context(cls, context: EventContext, args: Sequence[str]):
+        """从共享数据构建事件
+
+        Args:
+            context (EventContext): 同一条消息共享的数据
+            args (Sequence[str]): 指令参数
+        """
+        event = cls.__new__(cls)
+        event._context = context
+        event.args = args
+        return event
+
+    @property
+    def message(self) -> str:
+        return self._context.message
+
+    @property
+    def properties(self) -> dict:
+        return self._context.properties
+
+    @property
+    def _adapter(self) -> Adapter:
+        return self._context.adapter
+
+    @property
+    def _extra(self) -> dict:
+        return self._context.extra
 
     @property
     def info(self) -> dict:
@@ -169,9 +382,10 @@ class Event(Info):
         Returns:
             Coro[None] | None: 适配器发送方法的 Coro，如 key 不存在则返回 None
         """
-        if key not in self._adapter.sends_lib:
+        context = self._context
+        if (method := context.adapter.sends_lib.get(key)) is None:
             return
-        return self._adapter.sends_lib[key](message, **self._extra)
+        return method(message, **context.extra)
 
     def call(self, key: str, *args):
         """执行适配器调用方法，只接受位置参数
@@ -183,15 +397,23 @@ class Event(Info):
         Returns:
             Coro[Any] | None: 适配器调用方法的 Coro，如 key 不存在则返回 None
         """
-        if key not in self._adapter.calls_lib:
+        context = self._context
+        if (method := context.adapter.calls_lib.get(key)) is None:
             return
-        return self._adapter.calls_lib[key](*args, **self._extra)
+        return method(*args, **context.extra)
+
+    def __getitem__(self, name: str):
+        """读取属性，比属性访问少一次查找"""
+        return self._context.properties[name]
 
     def __getattr__(self, name: str):
-        try:
-            return self.properties[name]
-        except KeyError:
-            raise AttributeError(f"Event object has no attribute '{name}'")
+        if name == "_context":
+            # 复制时新对象尚未设置 _context
+            raise AttributeError(name)
+        properties = self._context.properties
+        if name in properties:
+            return properties[name]
+        raise AttributeError(f"Event object has no attribute '{name}'")
 
 
 class Result[K: str, T](Info):
@@ -226,6 +448,7 @@ class BaseHandle(Info):
         func (EventHandler): 处理器函数
         properties (set[str]): 声明属性
         block (tuple[bool, bool]): 是否阻止后续插件, 是否阻止后续任务
+        plugin (Any): 注册响应器的插件
     """
 
     def __init__(
@@ -237,3 +460,4 @@ class BaseHandle(Info):
         self.properties = set(properties)
         self.block = block
         self.func = func
+        self.plugin: Any = None
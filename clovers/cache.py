@@ -0,0 +1,143 @@
+import asyncio
+from time import monotonic
+from functools import update_wrapper
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any
+
+_MISSING: Any = object()
+
+
+class TTLCache[K: Hashable, V]:
+    """过期缓存
+
+    条目在写入 ttl 秒后过期，超出容量时淘汰最久未使用的条目
+
+    Attributes:
+        ttl (float): 过期时间
+        maxsize (int): 最大条目数
+        hits (int): 命中次数
+        misses (int): 未命中次数
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 1024) -> None:
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits: int = 0
+        self.misses: int = 0
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def info(self):
+        return {"ttl": self.ttl, "maxsize": self.maxsize, "size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+    def get(self, key: K, default: V = _MISSING) -> V:
+        """读取缓存
+
+        Args:
+            key (K): 缓存键
+            default (V): 未命中时的返回值
+
+        Returns:
+            V: 缓存值
+        """
+        if (item := self._data.get(key)) is None or item[0] < monotonic():
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def set(self, key: K, value: V):
+        """写入缓存
+
+        Args:
+            key (K): 缓存键
+            value (V): 缓存值
+        """
+        self._data[key] = (monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: K):
+        """删除缓存
+
+        Args:
+            key (K): 缓存键
+        """
+        self._data.pop(key, None)
+
+    def discard(self, key: K, value: V):
+        """缓存值仍为 value 时删除缓存
+
+        Args:
+            key (K): 缓存键
+            value (V): 缓存值
+        """
+        if (item := self._data.get(key)) is not None and item[1] is value:
+            del self._data[key]
+
+    def clear(self):
+        """清空缓存"""
+        self._data.clear()
+
+
+class CachedMethod:
+    """带缓存的适配器调用方法
+
+    缓存键由位置参数和方法实际需要的额外参数组成，也可以由 key 函数计算。
+
+    缓存的是请求本身，同一个键的并发调用会等待同一个请求，请求失败时不会写入缓存。
+
+    Attributes:
+        cache (TTLCache): 缓存
+    """
+
+    def __init__(
+        self,
+        func: Callable,
+        kwnames: tuple[str, ...] | None,
+        ttl: float,
+        maxsize: int = 1024,
+        key: Callable[..., Hashable] | None = None,
+    ) -> None:
+        update_wrapper(self, func)
+        self._func = func
+        self._kwnames = kwnames
+        self._key = key
+        self.cache: TTLCache[Hashable, asyncio.Future] = TTLCache(ttl, maxsize)
+
+    def cache_key(self, *args, **kwargs) -> Hashable:
+        """计算缓存键"""
+        if self._key is not None:
+            return self._key(*args, **kwargs)
+        if self._kwnames is None:
+            return args, tuple(sorted(kwargs.items()))
+        return args, tuple(kwargs.get(name) for name in self._kwnames)
+
+    def __call__(self, *args, **kwargs):
+        try:
+            key = self.cache_key(*args, **kwargs)
+            future = self.cache.get(key)
+        except TypeError:
+            # 缓存键不可哈希时直接调用
+            return self._func(*args, **kwargs)
+        if future is _MISSING:
+            future = asyncio.ensure_future(self._func(*args, **kwargs))
+            self.cache.set(key, future)
+            # 失败的请求只删除自己，过期后写入的新请求不受影响
+            future.add_done_callback(lambda f: (f.cancelled() or f.exception() is not None) and self.cache.discard(key, f))
+        return asyncio.shield(future)
+
+    def invalidate(self, *args, **kwargs):
+        """删除缓存，不传参数时清空全部缓存"""
+        if args or kwargs:
+            self.cache.invalidate(self.cache_key(*args, **kwargs))
+        else:
+            self.cache.clear()
@@ -1,4 +1,11 @@
 from .loader import ModuleLoader
+from .admission import Admission
+from .manifest import PluginManifest, LazyPlugin
+from .metrics import MetricsHook, MetricsAggregator
+from .watchdog import Watchdog
+from .outbox import Outbox
+from .ratelimit import RateLimiter
 from .core import AdapterCore, PluginLoader, CloversCore, CloversMultiCore
+from .shard import CloversShardedCore
 
-__all__ = ["ModuleLoader", "AdapterCore", "PluginLoader", "CloversCore", "CloversMultiCore"]
+__all__ = ["ModuleLoader", "Admission", "PluginManifest", "LazyPlugin", "MetricsHook", "MetricsAggregator", "Watchdog", "Outbox", "RateLimiter", "AdapterCore", "PluginLoader", "CloversCore", "CloversMultiCore", "CloversShardedCore"]
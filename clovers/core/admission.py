@@ -0,0 +1,160 @@
+import asyncio
+from collections import deque
+from typing import Literal
+from ..base import Info
+
+type OverflowPolicy = Literal["drop_newest", "drop_oldest", "block"]
+
+
+class Admission[T](Info):
+    """事件准入控制器
+
+    限制同时处理的事件数量，超出部分进入等待队列，队列满时按策略处理:
+
+        drop_newest: 丢弃新事件
+        drop_oldest: 丢弃队列中最早的事件
+        block: 同步派发时丢弃新事件，异步派发时阻塞调用方直到有空位
+
+    Attributes:
+        max_inflight (int): 最大同时处理数，为 0 时不限制
+        queue_size (int): 等待队列长度
+        policy (OverflowPolicy): 队列满时的策略
+        inflight (int): 正在处理的事件数
+        admitted (int): 已准入的事件数
+        rejected (int): 已拒绝的事件数
+    """
+
+    def __init__(self, max_inflight: int = 0, queue_size: int = 0, policy: OverflowPolicy = "drop_newest") -> None:
+        if policy not in ("drop_newest", "drop_oldest", "block"):
+            raise ValueError(f"Invalid overflow policy: {policy}")
+        self.max_inflight = max_inflight
+        self.queue_size = queue_size
+        self.policy: OverflowPolicy = policy
+        self.inflight: int = 0
+        self.admitted: int = 0
+        self.rejected: int = 0
+        self._pending: deque[T] = deque()
+        self._waiters: deque[asyncio.Future[bool]] = deque()
+
+    @property
+    def info(self):
+        return {
+            "max_inflight": self.max_inflight,
+            "queue_size": self.queue_size,
+            "policy": self.policy,
+            "inflight": self.inflight,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+    @property
+    def queued(self) -> int:
+        """等待队列中的事件数"""
+        return len(self._pending)
+
+    @property
+    def limited(self) -> bool:
+        return self.max_inflight > 0
+
+    def acquire(self) -> bool:
+        """尝试占用一个处理位
+
+        Returns:
+            bool: 是否占用成功
+        """
+        if self.inflight >= self.max_inflight > 0:
+            return False
+        self.inflight += 1
+        self.admitted += 1
+        return True
+
+    def enqueue(self, item: T) -> bool:
+        """把没有占用到处理位的事件放入等待队列
+
+        Args:
+            item (T): 等待处理的事件
+
+        Returns:
+            bool: 事件是否进入队列
+        """
+        if len(self._pending) < self.queue_size:
+            self._pending.append(item)
+            return True
+        self.rejected += 1
+        if self.policy != "drop_oldest" or not self._pending:
+            return False
+        self._pending.popleft()
+        self._pending.append(item)
+        return True
+
+    async def wait(self) -> bool:
+        """等待并占用一个处理位
+
+        Returns:
+            bool: 是否占用成功，控制器被清空时返回 False
+        """
+        if not self._waiters and not self._pending and self.acquire():
+            return True
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled() and waiter.result():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self) -> T | None:
+        """释放处理位
+
+        处理位会优先交给等待队列中的事件，其次是阻塞等待的调用方
+
+        Returns:
+            T | None: 接替处理位的事件
+        """
+        if self._pending:
+            self.admitted += 1
+            return self._pending.popleft()
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.admitted += 1
+                waiter.set_result(True)
+                return
+        self.inflight -= 1
+
+    def put(self, queue: asyncio.Queue[T], item: T) -> bool:
+        """按策略把事件放入工作队列，不会阻塞
+
+        Args:
+            queue (asyncio.Queue[T]): 工作队列
+            item (T): 事件
+
+        Returns:
+            bool: 事件是否进入队列
+        """
+        try:
+            queue.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            self.rejected += 1
+            if self.policy != "drop_oldest":
+                return False
+        queue.get_nowait()
+        queue.task_done()
+        queue.put_nowait(item)
+        return True
+
+    def clear(self):
+        """丢弃全部等待中的事件"""
+        self.rejected += len(self._pending)
+        self._pending.clear()
+        for waiter in self._waiters:
+            if not waiter.done():
+                self.rejected += 1
+                waiter.set_result(False)
+        self._waiters.clear()
@@ -1,9 +1,23 @@
+import sys
 import asyncio
+from importlib import invalidate_caches
 from abc import abstractmethod
-from .loader import ModuleLoader
+from time import perf_counter
+from functools import partial
+from collections.abc import Callable, Hashable, Iterable
+from .loader import ModuleLoader, LoadingError
 from .protocol import TypeProtocol
-from ..base import Coro, Info, Adapter, AdapterMethod, BaseHandle, Event
-from ..plugin import Handle, TempHandle, Plugin
+from .index import HandleIndex
+from .admission import Admission
+from .manifest import PluginManifest, LazyPlugin
+from .resolver import resolve
+from .metrics import MetricsHook, EventTrace, HandleTrace, emit
+from .watchdog import Watchdog
+from .outbox import Outbox, Destination
+from .ratelimit import RateLimiter
+from ..base import Coro, Info, Adapter, AdapterMethod, BaseHandle, Event, EventContext, EventProperties, cached
+from ..plugin import Handle, TempHandleRegistry, TempHandleTimer, Plugin
+from ..executor import HandleExecutor
 from ..logger import logger
 
 
@@ -19,21 +33,69 @@ class AdapterCore(Adapter, ModuleLoader[Adapter]):
         Adapter.__init__(self, name)
         ModuleLoader.__init__(self, ["ADAPTER", "adapter", "__adapter__"], Adapter)
         self.protocol = TypeProtocol()
+        self.outbox: Outbox | None = None
+        """发送队列，为 None 时响应结果在响应器任务中直接发送"""
+        self.ratelimit: RateLimiter | None = None
+        """发送限速器"""
+
+    def use_ratelimit(self, destination: Destination | None = None) -> RateLimiter:
+        """启用发送限速
+
+        已注册和之后注册的发送方法都会在发送前等待限速器的许可，规则通过 RateLimiter.limit 添加。
+
+        Args:
+            destination (Destination | None): 根据事件参数计算发送目标
+
+        Returns:
+            RateLimiter: 发送限速器
+        """
+        if self.ratelimit is not None:
+            self.ratelimit.destination = destination
+            return self.ratelimit
+        self.ratelimit = RateLimiter(destination)
+        # 原地替换，发送队列持有的方法库同时生效
+        for lib in (self.sends_lib, self.batch_sends_lib):
+            for key, func in lib.items():
+                lib[key] = self.ratelimit.wrap(key, func)
+        return self.ratelimit
+
+    def use_outbox(self, destination: Destination, window: float = 0.0, max_batch: int = 20) -> Outbox:
+        """启用发送队列
+
+        响应器返回结果后不再等待发送完成，结果按目标排队发送，同一目标的结果保持顺序，不同目标互不等待。
+
+        Args:
+            destination (Destination): 根据事件参数计算发送目标，批量发送的消息只在同一目标内合并
+            window (float): 批量发送方法的合并等待时间
+            max_batch (int): 单批最大消息数
+
+        Returns:
+            Outbox: 发送队列
+        """
+        self.outbox = Outbox(self.sends_lib, self.batch_sends_lib, destination, window, max_batch)
+        return self.outbox
 
     def register_send(self, method_name: str, func: AdapterMethod):
         if method_name in self.sends_lib:
             logger.warning(f"Method '{method_name}' already exists (from: {func.__module__}.{func.__qualname__})")
             return func
         self.protocol.register_send(method_name, func)
-        self.sends_lib[method_name] = func
+        self.sends_lib[method_name] = func if self.ratelimit is None else self.ratelimit.wrap(method_name, func)
         return func
 
-    def register_call(self, method_name: str, func: AdapterMethod):
+    def register_batch_send(self, method_name: str, func: AdapterMethod):
+        if method_name in self.batch_sends_lib:
+            logger.warning(f"Method '{method_name}' already exists (from: {func.__module__}.{func.__qualname__})")
+            return func
+        self.batch_sends_lib[method_name] = func if self.ratelimit is None else self.ratelimit.wrap(method_name, func)
+        return func
+
+    def register_call(self, method_name: str, func: AdapterMethod, ttl: float = 0, maxsize: int = 1024, key=None):
         if method_name in self.calls_lib:
             logger.warning(f"Method '{method_name}' already exists (from: {func.__module__}.{func.__qualname__})")
             return func
         self.protocol.register_call(method_name, func)
-        self.calls_lib[method_name] = func
+        self.calls_lib[method_name] = cached(func, ttl, maxsize, key) if ttl > 0 else func
         return func
 
     def _load(self, package: str):
@@ -49,12 +111,23 @@ class PluginLoader(Info, ModuleLoader[Plugin]):
     Attributes:
         name (str): 项目名
         plugins (list[Plugin]): 项目管理的插件列表
+        manifest (PluginManifest | None): 插件清单缓存，模块没有变化的插件跳过协议检查
+        lazy (bool): 是否按清单延迟导入插件
     """
 
     def __init__(self, protocol: TypeProtocol):
         self.protocol = protocol
         ModuleLoader.__init__(self, ["PLUGIN", "plugin", "__plugin__"], Plugin)
         self._plugins: list[Plugin] = []
+        self._packages: dict[str, Plugin] = {}
+        self.manifest: PluginManifest | None = None
+        """插件清单缓存"""
+        self.lazy: bool = False
+        """按清单延迟导入插件"""
+        self.dependencies: dict[Plugin, list[Plugin]] = {}
+        """插件依赖图，由 resolve 生成"""
+        self._resolved: bool = True
+        self._unresolved: set[str] = set()
 
     @property
     def info(self):
@@ -63,25 +136,186 @@ class PluginLoader(Info, ModuleLoader[Plugin]):
     def __iter__(self):
         yield from self._plugins
 
+    def _cached(self, package: str):
+        if self.manifest is None:
+            return None
+        return self.manifest.lookup(package, self.protocol)
+
     def _load(self, package: str):
+        if package in self._packages:
+            return
+        checked = False
+        if (entry := self._cached(package)) is not None:
+            if not entry["protocol"]:
+                logger.warning(f"[Clovers][PluginLoader] {entry['name']} ignored")
+                return
+            if self.lazy and not entry["eager"]:
+                plugin = LazyPlugin(package, entry, partial(self.load, package, self._attrs, self._type))
+                self._packages[package] = plugin
+                self.append(plugin, True)
+                return
+            checked = True
         plugin = super()._load(package)
         if plugin is None:
             return
         plugin.name = plugin.name or package
-        self.append(plugin)
+        self._packages[package] = plugin
+        compatible = self.append(plugin, checked)
+        if self.manifest is not None and not checked:
+            self.manifest.record(package, plugin, self.protocol, compatible)
+
+    def _requires(self, obj: Plugin):
+        return obj.require_plugins
+
+    def preload(self, packages: Iterable[str], workers: int):
+        if self.lazy:
+            packages = [package for package in packages if (entry := self._cached(package)) is None or entry["eager"]]
+        return super().preload(packages, workers)
 
-    def append(self, plugin: Plugin) -> None:
+    def append(self, plugin: Plugin, checked: bool = False) -> bool:
+        """添加插件
+
+        Args:
+            plugin (Plugin): 插件
+            checked (bool): 插件已通过协议检查
+
+        Returns:
+            bool: 插件是否通过协议检查
+        """
         if plugin in self._plugins:
-            return
+            return True
         # if not self.protocol:
         #     logger.warning("[Clovers][PluginLoader] Protocol missing. Ensure adapters are loaded before plugin initialization.")
-        if not self.protocol.check(plugin.protocol):
+        if not checked and not self.protocol.check(plugin.protocol):
             logger.warning(f"[Clovers][PluginLoader] {plugin.name} ignored")
-            return
-        if plugin.require_plugins:
-            self.load_from_list(plugin.require_plugins)
+            return False
         logger.info(f'[Clovers][PluginLoader] "{plugin.name}" loaded')
         self._plugins.append(plugin)
+        self._resolved = False
+        return True
+
+    def load_from_list(self, import_list: Iterable[str], workers: int = 0):
+        super().load_from_list(import_list, workers)
+        self.resolve(workers)
+
+    def find(self, name: str) -> Plugin | None:
+        """按模块导入名或插件名查找插件"""
+        return self._locate(name)
+
+    def package_of(self, plugin: Plugin) -> str | None:
+        """插件的模块导入名"""
+        return next((package for package, value in self._packages.items() if value is plugin), None)
+
+    def remove(self, plugin: Plugin) -> str | None:
+        """移除插件
+
+        插件列表会被替换而不是原地修改
+
+        Args:
+            plugin (Plugin): 插件
+
+        Returns:
+            str | None: 插件的模块导入名
+        """
+        self._plugins = [x for x in self._plugins if x is not plugin]
+        if (package := self.package_of(plugin)) is not None:
+            del self._packages[package]
+        self.dependencies = {k: [x for x in v if x is not plugin] for k, v in self.dependencies.items() if k is not plugin}
+        logger.info(f'[Clovers][PluginLoader] "{plugin.name}" removed')
+        return package
+
+    def reimport(self, package: str) -> Plugin | None:
+        """重新导入插件模块，不注册插件
+
+        导入失败时恢复原模块
+
+        Args:
+            package (str): 模块导入名
+
+        Returns:
+            Plugin | None: 新的插件
+        """
+        modules = {name: module for name, module in sys.modules.items() if name == package or name.startswith(f"{package}.")}
+        for name in modules:
+            del sys.modules[name]
+        invalidate_caches()
+        try:
+            return self.load(package, self._attrs, self._type)
+        except LoadingError as e:
+            logger.warning(f'Failed to reload "{package}": {e}')
+            sys.modules.update(modules)
+
+    def _locate(self, require: str) -> Plugin | None:
+        if (plugin := self._packages.get(require.replace("-", "_"))) is not None:
+            return plugin
+        return next((plugin for plugin in self._plugins if plugin.name == require), None)
+
+    def resolve(self, workers: int = 0) -> list[Plugin]:
+        """解析插件依赖
+
+        加载全部缺失的依赖，生成依赖图并按依赖顺序重排插件列表，依赖总是排在依赖它的插件之前。
+
+        循环依赖会被记录，循环内的插件之间不保证顺序。
+
+        Args:
+            workers (int): 并发导入依赖的线程数
+
+        Returns:
+            list[Plugin]: 排序后的插件列表
+        """
+        if self._resolved:
+            return self._plugins
+        while missing := [
+            require
+            for plugin in self._plugins
+            for require in plugin.require_plugins
+            if require not in self._unresolved and self._locate(require) is None
+        ]:
+            # 加载失败的依赖不再重试
+            self._unresolved.update(missing)
+            ModuleLoader.load_from_list(self, dict.fromkeys(missing), workers)
+        dependencies: dict[Plugin, list[Plugin]] = {}
+        for plugin in self._plugins:
+            dependencies[plugin] = deps = []
+            for require in sorted(plugin.require_plugins):
+                if (dep := self._locate(require)) is None or dep not in self._plugins:
+                    logger.warning(f'[Clovers][PluginLoader] "{plugin.name}" requires "{require}", which is not loaded')
+                elif dep is not plugin:
+                    deps.append(dep)
+        order, cycles = resolve(self._plugins, dependencies.__getitem__)
+        for cycle in cycles:
+            chain = " -> ".join(plugin.name for plugin in (*cycle, cycle[0]))
+            logger.warning(f"[Clovers][PluginLoader] circular dependency: {chain}")
+        self._plugins = order
+        self.dependencies = dependencies
+        self._resolved = True
+        if any(dependencies.values()):
+            logger.info(f"[Clovers][PluginLoader] plugin order: {', '.join(plugin.name for plugin in order)}")
+        return order
+
+    async def run_startup(self, plugins: Iterable[Plugin] | None = None):
+        """运行插件的启动任务
+
+        插件的启动任务在其依赖的启动任务完成后运行，互不依赖的插件并发启动。
+
+        Args:
+            plugins (Iterable[Plugin] | None): 需要启动的插件，默认为全部插件
+        """
+        started: dict[Plugin, asyncio.Task] = {}
+        targets = self._plugins if plugins is None else [plugin for plugin in self._plugins if plugin in set(plugins)]
+
+        async def startup(plugin: Plugin, deps: list[asyncio.Task]):
+            if deps:
+                await asyncio.gather(*deps)
+            if tasks := plugin.run_startup():
+                await asyncio.gather(*tasks)
+
+        for plugin in targets:
+            # 插件按依赖排序，循环依赖中排在后面的插件不会被等待
+            deps = [started[dep] for dep in self.dependencies.get(plugin, ()) if dep in started]
+            started[plugin] = asyncio.create_task(startup(plugin, deps))
+        if started:
+            await asyncio.gather(*started.values())
 
 
 class CloversCoreInterface(Info):
@@ -108,35 +342,51 @@ class CloversCore(CloversCoreInterface):
 
     Args:
         name (str): 项目名
-        temp_handles (dict[int, list[TempHandle]], optional): 临时响应器存储位置. Defaults to {}.
     """
 
     adapter: AdapterCore
     plugins: PluginLoader
 
-    type HandleBatch = list[Handle]
-    """同优先级的响应器组"""
-    type TempHandleBatchs = list[set[TempHandle]]
+    type HandleBatch = HandleIndex
+    """同优先级的响应器组索引"""
+    type TempHandleBatchs = list[TempHandleRegistry]
     """同优先级的临时响应器组"""
     type HandleBatchQueue = list[HandleBatch]
     """按响应优先级排序的响应器组队列"""
-    type HandleLayer = tuple[TempHandleBatchs, HandleBatchQueue]
-    """插件同一优先级下的响应器层"""
+    type HandleLayer = tuple[TempHandleBatchs, HandleBatchQueue, frozenset[str]]
+    """插件同一优先级下的响应器层，以及层内响应器声明的全部属性"""
 
     def __init__(self, name: str) -> None:
 
         self.adapter = AdapterCore(name)
         self.plugins = PluginLoader(self.adapter.protocol)
+        self._layers: dict[int, CloversCore.HandleLayer] = {}
         self._layers_queue: list[CloversCore.HandleLayer] = []
         self._ready: bool = False
         self._tasks: set[asyncio.Task] = set()
-        self._temp_handles: dict[int, CloversCore.TempHandleBatchs] = {}
+        self._reloading = asyncio.Lock()
+        self.admission: Admission[tuple[str, dict]] = Admission()
+        """事件准入控制器，默认不限制"""
+        self.workers: int = 0
+        """工作协程数量，大于 0 时事件由常驻的工作协程从队列中取出处理，否则每个事件创建一个任务"""
+        self.worker_key: Callable[[dict], Hashable] | None = None
+        """工作队列分组函数，根据事件参数计算分组，同组事件按顺序处理"""
+        self.drain_timeout: float = 0.0
+        """关闭时等待工作队列处理完毕的时长"""
+        self._queues: list[asyncio.Queue[tuple[str, dict]]] = []
+        self._workers: list[asyncio.Task] = []
+        self.executor = HandleExecutor()
+        """同步响应器的线程池与进程池"""
+        self.hooks: list[MetricsHook] = []
+        """指标钩子"""
+        self.watchdog: Watchdog | None = None
+        """响应器看门狗，默认不启用"""
 
     @property
     def info(self):
-        return {"adapter": self.adapter.info, "plugins": self.plugins.info}
+        return {"adapter": self.adapter.info, "plugins": self.plugins.info, "executor": self.executor.info}
 
-    def load_adapter(self, adapter_list: list[str] | None = None, adapter_dirs: list[str] | None = None):
+    def load_adapter(self, adapter_list: list[str] | None = None, adapter_dirs: list[str] | None = None, workers: int = 0):
         """加载 clovers 适配器
 
         会把目标适配器的方法注册到 self 中，如已有同名方法则忽略
@@ -144,23 +394,27 @@ class CloversCore(CloversCoreInterface):
         Args:
             adapter_list (list[str]): 适配器的包名列表
             adapter_dirs (list[str]): 适配器的目录列表
+            workers (int): 并发导入的线程数
         """
         if adapter_list:
-            self.adapter.load_from_list(adapter_list)
+            self.adapter.load_from_list(adapter_list, workers)
         if adapter_dirs:
-            self.adapter.load_from_dirs(adapter_dirs)
+            self.adapter.load_from_dirs(adapter_dirs, workers)
 
-    def load_plugin(self, plugin_list: list[str] | None = None, plugin_dirs: list[str] | None = None):
+    def load_plugin(self, plugin_list: list[str] | None = None, plugin_dirs: list[str] | None = None, workers: int = 0):
         """加载 clovers 插件, 注意适配器须在加载插件前优先加载，否则插件不会经适配器的协议检查
 
         Args:
             plugin_list (list[str]): 插件的包名列表
             plugin_dirs (list[str]): 插件的目录列表
+            workers (int): 并发导入的线程数，大于 1 时使用线程池并发导入插件及其依赖
         """
         if plugin_list:
-            self.plugins.load_from_list(plugin_list)
+            self.plugins.load_from_list(plugin_list, workers)
         if plugin_dirs:
-            self.plugins.load_from_dirs(plugin_dirs)
+            self.plugins.load_from_dirs(plugin_dirs, workers)
+        if self.plugins.manifest is not None:
+            self.plugins.manifest.save()
 
     def handles_filter(self, handle: BaseHandle) -> bool:
         if method_miss := handle.properties - self.adapter.calls_lib.keys():
@@ -180,38 +434,173 @@ class CloversCore(CloversCoreInterface):
         if self._ready:
             raise RuntimeError("Client is already running")
         self._ready = True
-        _handles: dict[int, list[Handle]] = {}
+        self.plugins.resolve()
         for plugin in self.plugins:
-            self._temp_handles.setdefault(plugin.priority, []).append(plugin.temp_handles)
-            _handles.setdefault(plugin.priority, []).extend(plugin)
-        for key in sorted(_handles.keys()):
-            _sub_handles: dict[int, list[Handle]] = {}
-            for handle in _handles[key]:
-                if self.handles_filter(handle):
-                    _sub_handles.setdefault(handle.priority, []).append(handle)
-            sub_keys = sorted(_sub_handles.keys())
-            self._layers_queue.append((self._temp_handles[key], [_sub_handles[k] for k in sub_keys]))
-        tasks = [task for plugin in self.plugins for task in plugin.run_startup()]
-        if tasks:
-            await asyncio.gather(*tasks)
-        self.dispatch = self._dispatch_active
+            plugin.executor = self.executor
+        self._rebuild_layers({plugin.priority for plugin in self.plugins})
+        await self.plugins.run_startup()
+        if self.workers > 0:
+            self.start_workers()
+            self.dispatch = self._dispatch_worker
+        else:
+            self.dispatch = self._dispatch_active
 
     async def shutdown(self):
         """关闭 clovers 核心"""
         if not self._ready:
             raise RuntimeError("Client is not running")
         self.dispatch = self._dispatch_inactive
+        self.admission.clear()
+        if self._workers:
+            await self.stop_workers()
         if self._tasks:
             for task in self._tasks:
                 if not task.done():
                     task.cancel()
             await asyncio.gather(*self._tasks, return_exceptions=True)
-        self._layers_queue.clear()
+        if self.adapter.outbox is not None:
+            await self.adapter.outbox.flush(self.drain_timeout or None)
+        self._layers = {}
+        self._layers_queue = []
         tasks = [task for plugin in self.plugins for task in plugin.run_shutdown()]
         if tasks:
             await asyncio.gather(*tasks)
+        await asyncio.to_thread(self.executor.shutdown)
         self._ready = False
 
+    def _build_layer(self, priority: int) -> HandleLayer | None:
+        plugins = [plugin for plugin in self.plugins if plugin.priority == priority]
+        if not plugins:
+            return None
+        _sub_handles: dict[int, list[Handle]] = {}
+        for plugin in plugins:
+            for handle in plugin:
+                if self.handles_filter(handle):
+                    _sub_handles.setdefault(handle.priority, []).append(handle)
+        sub_keys = sorted(_sub_handles.keys())
+        layer_properties = frozenset(x for handles in _sub_handles.values() for handle in handles for x in handle.properties)
+        return [plugin.temp_handles for plugin in plugins], [HandleIndex(_sub_handles[k]) for k in sub_keys], layer_properties
+
+    def _rebuild_layers(self, priorities: Iterable[int]):
+        """重建指定优先级的响应器层
+
+        响应器层队列整体替换，正在响应的事件继续使用原来的队列
+        """
+        layers = dict(self._layers)
+        for priority in priorities:
+            if (layer := self._build_layer(priority)) is None:
+                layers.pop(priority, None)
+            else:
+                layers[priority] = layer
+        self._layers = layers
+        self._layers_queue = [layers[k] for k in sorted(layers)]
+
+    def _lookup(self, plugin: Plugin | str) -> Plugin | None:
+        if isinstance(plugin, str):
+            return self.plugins.find(plugin)
+        return plugin if plugin in self.plugins else None
+
+    async def add_plugin(self, plugin: Plugin | str) -> Plugin | None:
+        """运行时添加插件
+
+        插件及其缺失的依赖会被加载并启动，只重建它们所在优先级的响应器层
+
+        Args:
+            plugin (Plugin | str): 插件或插件的模块导入名
+
+        Returns:
+            Plugin | None: 添加的插件
+        """
+        async with self._reloading:
+            before = set(self.plugins)
+            if isinstance(plugin, str):
+                package = plugin.replace("-", "_")
+                await asyncio.to_thread(self.plugins._preload, package)
+                self.plugins.load_from_list([package])
+                result = self.plugins.find(package)
+            else:
+                result = plugin if self.plugins.append(plugin) else None
+                self.plugins.resolve()
+            if self._ready and (added := [x for x in self.plugins if x not in before]):
+                for x in added:
+                    x.executor = self.executor
+                self._rebuild_layers({x.priority for x in added})
+                await self.plugins.run_startup(added)
+            if self.plugins.manifest is not None:
+                self.plugins.manifest.save()
+            return result
+
+    async def unload_plugin(self, plugin: Plugin | str) -> Plugin | None:
+        """运行时卸载插件
+
+        插件的响应器会先从响应器层中移除，再运行插件的结束任务
+
+        Args:
+            plugin (Plugin | str): 插件，插件名或插件的模块导入名
+
+        Returns:
+            Plugin | None: 卸载的插件
+        """
+        async with self._reloading:
+            if (target := self._lookup(plugin)) is None:
+                logger.warning(f"[Clovers][CloversCore] plugin {plugin} is not loaded")
+                return None
+            if dependents := [x.name for x, deps in self.plugins.dependencies.items() if target in deps]:
+                logger.warning(f'[Clovers][CloversCore] "{target.name}" is required by {", ".join(dependents)}')
+            self.plugins.remove(target)
+            if self._ready:
+                self._rebuild_layers({target.priority})
+                if tasks := target.run_shutdown():
+                    await asyncio.gather(*tasks)
+            return target
+
+    async def reload_plugin(self, plugin: Plugin | str) -> Plugin | None:
+        """运行时重新加载插件
+
+        只重新导入插件自身的模块，导入失败或未通过协议检查时保留原插件。
+
+        原插件未结束的临时任务会转交给新插件。
+
+        Args:
+            plugin (Plugin | str): 插件，插件名或插件的模块导入名
+
+        Returns:
+            Plugin | None: 新的插件
+        """
+        async with self._reloading:
+            if (old := self._lookup(plugin)) is None:
+                logger.warning(f"[Clovers][CloversCore] plugin {plugin} is not loaded")
+                return None
+            if (package := self.plugins.package_of(old)) is None:
+                logger.warning(f'[Clovers][CloversCore] "{old.name}" was not loaded from a module and cannot be reloaded')
+                return None
+            if await asyncio.to_thread(self.plugins.reimport, package) is None:
+                return None
+            self.plugins.remove(old)
+            before = set(self.plugins)
+            self.plugins._load(package)
+            # 未通过协议检查的新插件同样会记录在 _packages 中，但不会进入插件列表
+            if (new := self.plugins._packages.get(package)) is None or new not in self.plugins:
+                self.plugins._packages[package] = old
+                self.plugins.append(old, True)
+                self.plugins.resolve()
+                return None
+            self.plugins.resolve()
+            old.temp_handles.key = new.temp_handles.key
+            new.temp_handles, new.temp_timer = old.temp_handles, old.temp_timer
+            old.temp_timer = TempHandleTimer()
+            if self._ready:
+                added = [x for x in self.plugins if x not in before]
+                for x in added:
+                    x.executor = self.executor
+                self._rebuild_layers({old.priority, *(x.priority for x in added)})
+                if tasks := old.run_shutdown():
+                    await asyncio.gather(*tasks)
+                await self.plugins.run_startup(added)
+            if self.plugins.manifest is not None:
+                self.plugins.manifest.save()
+            return new
+
     @abstractmethod
     def extract_message(self, **extra) -> str | None:
         """提取消息
@@ -227,24 +616,74 @@ class CloversCore(CloversCoreInterface):
 
         raise NotImplementedError
 
-    async def invoke_handler(self, handle: BaseHandle, event: Event, extra: dict):
+    async def invoke_handler(self, handle: BaseHandle, event: Event, extra: dict, trace: HandleTrace | None = None):
         """使用适配器响应任务
 
         Args:
             handle (BaseHandle): 触发的插件任务
             event (Event): 触发响应的事件
             extra (dict): 适配器需要的额外参数
+            trace (HandleTrace | None): 各阶段耗时记录，添加了指标钩子时传入
         """
-        if handle.properties and (keys := handle.properties - event.properties.keys()):
-            coros = (self.adapter.calls_lib[key](**extra) for key in keys)
-            event.properties.update({k: v for k, v in zip(keys, await asyncio.gather(*coros))})
-        if result := await handle.func(event):
-            await self.adapter.sends_lib[result.key](result.data, **extra)
+        if trace is not None:
+            start = perf_counter()
+        if handle.properties and not event.properties.keys() >= handle.properties:
+            await event.properties.fetch(handle.properties, self.adapter.calls_lib, extra)
+        if trace is not None:
+            trace.fetch = (fetched := perf_counter()) - start
+        result = await handle.func(event)
+        if trace is not None:
+            trace.run = (start := perf_counter()) - fetched
+        if result:
+            if (outbox := self.adapter.outbox) is None:
+                await self.adapter.sends_lib[result.key](result.data, **extra)
+            else:
+                outbox.put(result.key, result.data, extra)
+            if trace is not None:
+                trace.send = perf_counter() - start
+                trace.block = handle.block
             return handle.block
 
+    def add_hook(self, hook: MetricsHook):
+        """添加指标钩子
+
+        Args:
+            hook (MetricsHook): 指标钩子
+        """
+        self.hooks = [*self.hooks, hook]
+        return hook
+
+    def remove_hook(self, hook: MetricsHook):
+        """移除指标钩子
+
+        Args:
+            hook (MetricsHook): 指标钩子
+        """
+        self.hooks = [x for x in self.hooks if x is not hook]
+
+    async def _traced_invoke(self, trace: EventTrace, handle: BaseHandle, event: Event, extra: dict):
+        record = HandleTrace(handle)
+        # 开始时计入，被看门狗脱离的响应器在消息结束后才完成
+        trace.handles.append(record)
+        try:
+            return await self.invoke_handler(handle, event, extra, record)
+        except BaseException:
+            record.error = True
+            raise
+        finally:
+            emit(self.hooks, "on_handle", record)
+
+    def _invoker(self, trace: EventTrace | None) -> Callable[[BaseHandle, Event, dict], Coro]:
+        invoke = self.invoke_handler if trace is None else partial(self._traced_invoke, trace)
+        if (watchdog := self.watchdog) is None:
+            return invoke
+        return lambda handle, event, extra: watchdog.run(handle, invoke(handle, event, extra), self.create_task)
+
     async def response_message(self, message: str, /, **extra):
         """响应消息
 
+        添加了指标钩子时记录各阶段耗时
+
         Args:
             message (str): 消息内容
             **extra: 额外的参数
@@ -254,14 +693,38 @@ class CloversCore(CloversCoreInterface):
         """
         if not message:
             return 0
+        if not self.hooks:
+            return await self._respond(message, extra, self._invoker(None), None)
+        temp_handles = sum(len(registry) for layer in self._layers_queue for registry in layer[0])
+        # 任务模式下事件在准入控制器中排队，工作协程模式下在工作队列中排队
+        depth = self.admission.inflight + self.admission.queued + sum(queue.qsize() for queue in self._queues)
+        trace = EventTrace(message, depth, temp_handles)
+        try:
+            trace.count = await self._respond(message, extra, self._invoker(trace), trace)
+            return trace.count
+        finally:
+            trace.total = perf_counter() - trace.start
+            emit(self.hooks, "on_event", trace)
+
+    @staticmethod
+    def _match(index: HandleIndex, message: str, trace: EventTrace | None):
+        if trace is None:
+            return index.match(message)
+        start = perf_counter()
+        hits = index.match(message)
+        trace.match += perf_counter() - start
+        return hits
+
+    async def _respond(self, message: str, extra: dict, invoke: Callable[[BaseHandle, Event, dict], Coro], trace: EventTrace | None):
         count = 0
         temp_event = None
-        properties = {}
-        for temp_batchs, batch_list in self._layers_queue:
-            temp_handles = [handle for batch in temp_batchs for handle in batch]
+        properties = EventProperties()
+        context = EventContext(message, properties, self.adapter, extra)
+        for temp_batchs, batch_list, layer_properties in self._layers_queue:
+            temp_handles = [handle for registry in temp_batchs for handle in registry.select(extra)]
             if temp_handles:
-                temp_event = temp_event or Event(message, [], properties, self.adapter, extra)
-                blocks = await asyncio.gather(*(self.invoke_handler(handle, temp_event, extra) for handle in temp_handles))
+                temp_event = temp_event or Event.from_context(context, [])
+                blocks = await asyncio.gather(*(invoke(handle, temp_event, extra) for handle in temp_handles))
                 blocks = [block for block in blocks if block is not None]
                 if blocks:
                     blk_p, blk_h = zip(*blocks)
@@ -271,12 +734,16 @@ class CloversCore(CloversCoreInterface):
                     elif any(blk_h):
                         continue
             delay_fuse = False
-            for handles in batch_list:
-                tasklist = (
-                    self.invoke_handler(handle, Event(message, args, properties, self.adapter, extra), extra)
-                    for handle in handles
-                    if (args := handle.match(message)) is not None
-                )
+            batch_hits = (self._match(index, message, trace) for index in batch_list)
+            if layer_properties:
+                # 同一层匹配的全部响应器需要的属性一次性并发获取，没有属性的层逐组匹配，阻断后不再匹配
+                batch_hits = list(batch_hits)
+                if keys := {x for hits in batch_hits for handle, _ in hits for x in handle.properties}:
+                    properties.prefetch(keys, self.adapter.calls_lib, extra)
+            for hits in batch_hits:
+                if not hits:
+                    continue
+                tasklist = (invoke(handle, Event.from_context(context, args), extra) for handle, args in hits)
                 blocks = await asyncio.gather(*tasklist)
                 blocks = [block for block in blocks if block]
                 if blocks:
@@ -299,7 +766,7 @@ class CloversCore(CloversCoreInterface):
     def dispatch(self, **extra) -> asyncio.Task[int] | None:
         """响应事件
 
-        根据传入的事件参数响应事件。
+        根据传入的事件参数响应事件，事件需经过准入控制器 admission 放行。
 
         Args:
             **extra: 额外的参数
@@ -310,8 +777,90 @@ class CloversCore(CloversCoreInterface):
 
     def _dispatch_active(self, **extra):
 
-        if (message := self.extract_message(**extra)) is not None:
-            return self.create_task(self.response_message(message, **extra))
+        if (message := self.extract_message(**extra)) is None:
+            return
+        if self.admission.acquire():
+            return self._admitted_task(message, extra)
+        if not self.admission.enqueue((message, extra)):
+            logger.debug(f"[Clovers][CloversCore] event rejected: {self.admission.info}")
+
+    async def dispatch_wait(self, **extra) -> asyncio.Task[int] | None:
+        """响应事件
+
+        与 dispatch 相同，但在准入控制器没有空位时会等待，而不是进入等待队列或丢弃事件。
+
+        Args:
+            **extra: 额外的参数
+        """
+        if not self._ready or (message := self.extract_message(**extra)) is None:
+            return
+        if self._queues:
+            await self._route(extra).put((message, extra))
+        elif await self.admission.wait():
+            return self._admitted_task(message, extra)
+
+    def _admitted_task(self, message: str, extra: dict):
+        task = self.create_task(self.response_message(message, **extra))
+        # 不限制时同样释放，inflight 保持为实际处理数，之后设置上限也能立即生效
+        task.add_done_callback(self._release_admission)
+        return task
+
+    def _release_admission(self, task: asyncio.Task):
+        if (pending := self.admission.release()) is not None:
+            self._admitted_task(*pending)
+
+    def start_workers(self):
+        """启动工作协程
+
+        未设置分组函数时全部工作协程共用一个队列，否则每个工作协程拥有独立的队列，同组事件总是进入同一个队列。
+
+        队列长度为准入控制器的 queue_size，此模式下同时处理的事件数即工作协程数量。
+        """
+        maxsize = self.admission.queue_size
+        queue_count = 1 if self.worker_key is None else self.workers
+        self._queues = [asyncio.Queue(maxsize) for _ in range(queue_count)]
+        self._workers = [asyncio.create_task(self._worker(self._queues[i % queue_count])) for i in range(self.workers)]
+
+    async def stop_workers(self):
+        """停止工作协程，在 drain_timeout 内等待已入队的事件处理完毕"""
+        if self.drain_timeout > 0:
+            try:
+                await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self._queues)), self.drain_timeout)
+            except TimeoutError:
+                logger.warning(f"[Clovers][CloversCore] {sum(q.qsize() for q in self._queues)} queued events dropped on shutdown")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        for queue in self._queues:
+            self.admission.rejected += queue.qsize()
+        self._workers.clear()
+        self._queues.clear()
+
+    async def _worker(self, queue: asyncio.Queue[tuple[str, dict]]):
+        admission = self.admission
+        while True:
+            message, extra = await queue.get()
+            admission.inflight += 1
+            admission.admitted += 1
+            try:
+                await self.response_message(message, **extra)
+            except Exception:
+                logger.exception(f"[Clovers][CloversCore] failed to respond message: {message}")
+            finally:
+                admission.inflight -= 1
+                queue.task_done()
+
+    def _route(self, extra: dict):
+        if self.worker_key is None:
+            return self._queues[0]
+        return self._queues[hash(self.worker_key(extra)) % len(self._queues)]
+
+    def _dispatch_worker(self, **extra):
+
+        if (message := self.extract_message(**extra)) is None:
+            return
+        if not self.admission.put(self._route(extra), (message, extra)):
+            logger.debug(f"[Clovers][CloversCore] event rejected: {self.admission.info}")
 
 
 class CloversMultiCore(CloversCoreInterface):
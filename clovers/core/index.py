@@ -0,0 +1,62 @@
+from collections.abc import Iterable, Sequence
+from ..matcher import CommandTrie, RegexMatcher
+from ..plugin import Handle
+
+
+class HandleIndex:
+    """同优先级响应器组的匹配索引
+
+    在启动时构建，把响应器按匹配方式分类:
+
+        指令响应器: 通过前缀树查找候选
+        正则响应器: 合并为一个分支表达式，每条消息只扫描一次
+        其他响应器: 每条消息都需要匹配
+
+    Attributes:
+        handles (list[Handle]): 响应器组
+    """
+
+    def __init__(self, handles: Iterable[Handle]):
+        self.handles = list(handles)
+        self._order = {handle: i for i, handle in enumerate(self.handles)}
+        self._trie = CommandTrie[Handle]()
+        regex: list[Handle] = []
+        self._always: list[Handle] = []
+        for handle in self.handles:
+            if handle.match == handle.match_commands:
+                for command in handle.commands:
+                    self._trie.insert(command, handle)
+            elif handle.match == handle.match_regex:
+                regex.append(handle)
+            else:
+                self._always.append(handle)
+        self._regex = RegexMatcher[Handle]((handle.patttrn, handle) for handle in regex)
+
+    def __iter__(self):
+        yield from self.handles
+
+    def __len__(self):
+        return len(self.handles)
+
+    def match(self, message: str) -> list[tuple[Handle, Sequence[str]]]:
+        """匹配消息
+
+        指令响应器取其最长的指令前缀，参数只从前缀之后的部分切分
+
+        Args:
+            message (str): 待匹配的消息
+
+        Returns:
+            list[tuple[Handle, Sequence[str]]]: 按注册顺序排列的 (匹配的响应器, 参数)
+        """
+        depths: dict[Handle, int] = {}
+        for depth, handles in self._trie.prefixes(message):
+            for handle in handles:
+                depths[handle] = depth
+        hits: list[tuple[Handle, Sequence[str]]] = [(handle, message[depth:].split()) for handle, depth in depths.items()]
+        if self._regex:
+            hits.extend(self._regex.match(message))
+        hits.extend((handle, args) for handle in self._always if (args := handle.match(message)) is not None)
+        if len(hits) > 1:
+            hits.sort(key=lambda hit: self._order[hit[0]])
+        return hits
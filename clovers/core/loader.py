@@ -1,6 +1,8 @@
 from pathlib import Path
+from time import perf_counter
 from importlib import import_module
 from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 from collections.abc import Iterable
 from ..logger import logger
 
@@ -67,6 +69,8 @@ class ModuleLoader[T]:
     def __init__(self, _attrs: list[str], _type: type[T]):
         self._attrs = _attrs
         self._type = _type
+        self.timings: dict[str, float] = {}
+        """模块导入耗时"""
 
     @staticmethod
     def load(package: str, _attrs: list[str], _type: type[T]) -> T:
@@ -86,20 +90,87 @@ class ModuleLoader[T]:
         return attr
 
     def _load(self, package: str):
+        start = perf_counter()
         try:
             return self.load(package, self._attrs, self._type)
         except LoadingError as e:
             logger.warning(f'Failed to load "{package}": {e}')
+        finally:
+            self.timings[package] = cost = perf_counter() - start
+            logger.debug(f'[Clovers] "{package}" imported in {cost:.3f}s')
 
-    def load_from_list(self, import_list: Iterable[str]):
-        """从包名列表加载"""
-        for package in import_list:
-            self._load(package.replace("-", "_"))
+    def _requires(self, obj: T) -> Iterable[str]:
+        """模块对象依赖的其他模块"""
+        return ()
 
-    def load_from_dirs(self, import_dirs: Iterable[str]):
-        """从本地目录列表加载"""
+    def _preload(self, package: str) -> tuple[T | None, float]:
+        start = perf_counter()
+        try:
+            obj = self.load(package, self._attrs, self._type)
+        except LoadingError:
+            # 错误在之后按顺序加载时记录
+            obj = None
+        return obj, perf_counter() - start
+
+    def preload(self, packages: Iterable[str], workers: int):
+        """使用线程池并发导入模块及其依赖，不注册模块对象
+
+        依赖在导入模块后才能得知，因此按轮次导入: 每轮并发导入上一轮发现的全部新依赖。
+
+        Args:
+            packages (Iterable[str]): 包名列表
+            workers (int): 线程数
+
+        Returns:
+            dict[str, float]: 各模块导入耗时
+        """
+        timings: dict[str, float] = {}
+        pending = list(dict.fromkeys(packages))
+        seen = set(pending)
+        start = perf_counter()
+        with ThreadPoolExecutor(workers, thread_name_prefix="clovers-import") as pool:
+            while pending:
+                results = list(pool.map(self._preload, pending))
+                requires = []
+                for package, (obj, cost) in zip(pending, results):
+                    timings[package] = cost
+                    if obj is None:
+                        continue
+                    for require in self._requires(obj):
+                        if (require := require.replace("-", "_")) not in seen:
+                            seen.add(require)
+                            requires.append(require)
+                pending = requires
+        if timings:
+            slowest = ", ".join(f"{k}({v:.2f}s)" for k, v in sorted(timings.items(), key=lambda x: x[1], reverse=True)[:5])
+            logger.info(f"[Clovers] {len(timings)} modules imported in {perf_counter() - start:.2f}s, slowest: {slowest}")
+        return timings
+
+    def load_from_list(self, import_list: Iterable[str], workers: int = 0):
+        """从包名列表加载
+
+        Args:
+            import_list (Iterable[str]): 包名列表
+            workers (int): 并发导入的线程数，大于 1 时先并发导入全部模块及其依赖，再按列表顺序注册
+        """
+        packages = [package.replace("-", "_") for package in import_list]
+        timings = self.preload(packages, workers) if workers > 1 and len(packages) > 1 else None
+        for package in packages:
+            self._load(package)
+        if timings:
+            self.timings.update(timings)
+
+    def load_from_dirs(self, import_dirs: Iterable[str], workers: int = 0):
+        """从本地目录列表加载
+
+        Args:
+            import_dirs (Iterable[str]): 目录列表
+            workers (int): 并发导入的线程数
+        """
+        packages = []
         for import_dir in import_dirs:
             dir = Path(import_dir)
             if not dir.exists():
                 continue
-            self.load_from_list(list_modules(dir))
+            packages.extend(list_modules(dir))
+        self.load_from_list(packages, workers)
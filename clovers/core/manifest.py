@@ -0,0 +1,203 @@
+import re
+import json
+import asyncio
+import hashlib
+from pathlib import Path
+from importlib.util import find_spec
+from collections.abc import Callable
+from typing import Any
+from .protocol import TypeProtocol
+from ..base import Event
+from ..plugin import Handle, Plugin
+from ..logger import logger
+
+
+def module_stamp(package: str) -> list | None:
+    """获取模块文件的修改时间、总大小与文件数，包模块统计目录下全部 .py 文件
+
+    Args:
+        package (str): 模块导入名
+
+    Returns:
+        list | None: 模块标记，找不到模块文件时返回 None
+    """
+    try:
+        spec = find_spec(package)
+    except (ImportError, ValueError):
+        return None
+    if spec is None:
+        return None
+    if spec.submodule_search_locations:
+        files = [file for location in spec.submodule_search_locations for file in Path(location).rglob("*.py")]
+    elif spec.origin and spec.has_location:
+        files = [Path(spec.origin)]
+    else:
+        return None
+    stats = [file.stat() for file in files]
+    return [max((stat.st_mtime for stat in stats), default=0.0), sum(stat.st_size for stat in stats), len(stats)]
+
+
+def protocol_key(protocol: TypeProtocol) -> str:
+    """适配器类型协议的摘要，协议变化后需要重新检查插件"""
+    data = repr((sorted(protocol.call.items()), sorted(protocol.send.items())))
+    return hashlib.sha1(data.encode()).hexdigest()
+
+
+def handle_manifest(handle: Handle) -> dict | None:
+    """记录响应器的匹配方式与属性，无法记录时返回 None"""
+    if handle.match == handle.match_commands:
+        command = {"commands": handle.commands}
+    elif handle.match == handle.match_regex:
+        command = {"regex": handle.patttrn.pattern, "flags": handle.patttrn.flags}
+    elif handle.match is Handle.match_none:
+        command = None
+    else:
+        return None
+    return {"command": command, "properties": sorted(handle.properties), "priority": handle.priority, "block": list(handle.block)}
+
+
+def handle_signature(data: dict) -> str:
+    return json.dumps(data, sort_keys=True, ensure_ascii=False)
+
+
+def build_command(command: dict | None):
+    if command is None:
+        return None
+    if "commands" in command:
+        return command["commands"]
+    return re.compile(command["regex"], command["flags"])
+
+
+class LazyPlugin(Plugin):
+    """按清单构建的延迟导入插件
+
+    响应器按清单记录的指令与属性构建，第一次被触发时才在线程中导入插件模块，之后转发给插件的同名响应器。
+
+    Attributes:
+        package (str): 插件模块导入名
+        plugin (Plugin | None): 已导入的插件
+    """
+
+    def __init__(self, package: str, entry: dict, load: Callable[[], Plugin]):
+        super().__init__(entry["name"], entry["priority"], entry["block"])
+        self.package = package
+        self.plugin: Plugin | None = None
+        self.require_plugins = set(entry["requires"])
+        self._import = load
+        self._loading: asyncio.Future[Plugin] | None = None
+        self._targets: dict[str, list[Handle]] = {}
+        counter: dict[str, int] = {}
+        for data in entry["handles"]:
+            signature = handle_signature(data)
+            index = counter[signature] = counter.get(signature, -1) + 1
+            handle = Handle(build_command(data["command"]), data["properties"], data["priority"], tuple(data["block"]), self._proxy(signature, index))
+            handle.plugin = self
+            self._handles.add(handle)
+
+    def _proxy(self, signature: str, index: int):
+        async def func(event: Event):
+            await self.resolve()
+            return await self._targets[signature][index].func(event)
+
+        return func
+
+    async def resolve(self) -> Plugin:
+        """导入插件模块"""
+        if self._loading is None:
+            self._loading = asyncio.ensure_future(asyncio.to_thread(self._import))
+        plugin = await asyncio.shield(self._loading)
+        if self.plugin is None:
+            self._bind(plugin)
+        return plugin
+
+    def _bind(self, plugin: Plugin):
+        for handle in plugin:
+            if (data := handle_manifest(handle)) is not None:
+                self._targets.setdefault(handle_signature(data), []).append(handle)
+        # 插件运行时创建的临时任务需要进入核心已收集的注册表
+        self.temp_handles.key = plugin.temp_handles.key
+        plugin.temp_handles = self.temp_handles
+        plugin.temp_timer = self.temp_timer
+        plugin.executor = self.executor
+        plugin.is_started = True
+        self.plugin = plugin
+        logger.info(f'[Clovers][PluginLoader] "{self.name}" imported on demand')
+
+
+class PluginManifest:
+    """插件清单缓存
+
+    以模块文件的修改时间与大小为标记，记录插件的名称、优先级、响应器指令与属性，以及协议检查结果。
+
+    下次启动时，模块没有变化的插件可以跳过协议检查，或者使用 LazyPlugin 延迟到响应器被触发时再导入。
+
+    注册了启动或结束任务、使用自定义匹配方式的插件不能延迟导入。
+
+    Attributes:
+        path (Path): 清单文件路径
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path) if isinstance(path, str) else path
+        self._plugins: dict[str, dict[str, Any]] = {}
+        self._dirty = False
+        if self.path.exists():
+            try:
+                self._plugins = json.loads(self.path.read_text(encoding="utf8"))["plugins"]
+            except (ValueError, KeyError) as e:
+                logger.warning(f"[Clovers][PluginManifest] {self.path} ignored: {e}")
+
+    def lookup(self, package: str, protocol: TypeProtocol) -> dict[str, Any] | None:
+        """查找模块没有变化的插件记录
+
+        Args:
+            package (str): 插件模块导入名
+            protocol (TypeProtocol): 适配器类型协议
+
+        Returns:
+            dict[str, Any] | None: 插件记录
+        """
+        if (entry := self._plugins.get(package)) is None:
+            return None
+        if entry["stamp"] != module_stamp(package) or entry["protocol_key"] != protocol_key(protocol):
+            return None
+        return entry
+
+    def record(self, package: str, plugin: Plugin, protocol: TypeProtocol, compatible: bool):
+        """记录插件
+
+        Args:
+            package (str): 插件模块导入名
+            plugin (Plugin): 插件
+            protocol (TypeProtocol): 适配器类型协议
+            compatible (bool): 插件是否通过协议检查
+        """
+        if isinstance(plugin, LazyPlugin) or (stamp := module_stamp(package)) is None:
+            return
+        handles = [handle_manifest(handle) for handle in plugin]
+        eager = (
+            type(plugin) is not Plugin
+            or bool(plugin._startup_tasklist)
+            or bool(plugin._shutdown_tasklist)
+            or any(data is None for data in handles)
+        )
+        self._plugins[package] = {
+            "stamp": stamp,
+            "protocol_key": protocol_key(protocol),
+            "protocol": compatible,
+            "name": plugin.name,
+            "priority": plugin.priority,
+            "block": plugin.block,
+            "requires": sorted(plugin.require_plugins),
+            "eager": eager,
+            "handles": [] if eager else handles,
+        }
+        self._dirty = True
+
+    def save(self):
+        """保存清单文件"""
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        self.path.write_text(json.dumps({"plugins": self._plugins}, ensure_ascii=False, indent=2), encoding="utf8")
+        self._dirty = False
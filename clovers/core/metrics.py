@@ -0,0 +1,264 @@
+import json
+from bisect import bisect_left
+from time import perf_counter
+from collections.abc import Sequence
+from ..base import Info, BaseHandle
+from ..logger import logger
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+"""默认耗时分桶（秒）"""
+
+
+def handle_label(handle: BaseHandle) -> tuple[str, str]:
+    """响应器的插件名与指令，用于标记指标
+
+    Args:
+        handle (BaseHandle): 响应器
+
+    Returns:
+        tuple[str, str]: (插件名, 指令)
+    """
+    plugin = handle.plugin.name if handle.plugin is not None else ""
+    return plugin, getattr(handle, "command", "<temp>")
+
+
+class HandleTrace:
+    """单个响应器的耗时
+
+    Attributes:
+        handle (BaseHandle): 响应器
+        fetch (float): 获取属性耗时
+        run (float): 响应器运行耗时
+        send (float): 发送结果耗时
+        block (tuple[bool, bool] | None): 响应器返回结果时的阻断设置，没有结果时为 None
+        error (bool): 响应器是否抛出异常
+    """
+
+    __slots__ = ("handle", "fetch", "run", "send", "block", "error")
+
+    def __init__(self, handle: BaseHandle) -> None:
+        self.handle = handle
+        self.fetch: float = 0.0
+        self.run: float = 0.0
+        self.send: float = 0.0
+        self.block: tuple[bool, bool] | None = None
+        self.error: bool = False
+
+
+class EventTrace:
+    """单条消息的耗时
+
+    Attributes:
+        message (str): 消息
+        start (float): 开始时间
+        total (float): 总耗时
+        match (float): 匹配指令耗时
+        count (int): 响应数量
+        handles (list[HandleTrace]): 被触发的响应器
+        tasks (int): 开始时核心中正在处理与排队等待的事件数
+        temp_handles (int): 开始时存活的临时响应器数
+    """
+
+    __slots__ = ("message", "start", "total", "match", "count", "handles", "tasks", "temp_handles")
+
+    def __init__(self, message: str, tasks: int, temp_handles: int) -> None:
+        self.message = message
+        self.start = perf_counter()
+        self.total: float = 0.0
+        self.match: float = 0.0
+        self.count: int = 0
+        self.handles: list[HandleTrace] = []
+        self.tasks = tasks
+        self.temp_handles = temp_handles
+
+
+class MetricsHook:
+    """指标钩子基类
+
+    通过 CloversCore.add_hook 添加，没有钩子时核心不会记录任何耗时。
+
+    钩子在事件循环中同步调用，不应执行耗时操作。
+    """
+
+    def on_handle(self, trace: HandleTrace) -> None:
+        """响应器结束时调用"""
+
+    def on_event(self, trace: EventTrace) -> None:
+        """消息响应结束时调用"""
+
+
+class Histogram(Info):
+    """累计分桶直方图
+
+    Attributes:
+        buckets (Sequence[float]): 分桶上界
+        counts (list[int]): 各分桶的计数，最后一项为超出全部上界的计数
+        count (int): 总计数
+        sum (float): 总和
+    """
+
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts: list[int] = [0] * (len(buckets) + 1)
+        self.count: int = 0
+        self.sum: float = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """按分桶估计分位数，返回所在分桶的上界"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            if total >= rank:
+                return bound
+        return float("inf")
+
+    @property
+    def info(self):
+        return {"count": self.count, "sum": self.sum, "p50": self.quantile(0.5), "p99": self.quantile(0.99)}
+
+    def prometheus(self, name: str, labels: str = "") -> list[str]:
+        """导出为 Prometheus 文本格式的行"""
+        sep = "," if labels else ""
+        lines = []
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {total}')
+        lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {self.count}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.sum}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+
+def _escape(value: str):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsAggregator(MetricsHook, Info):
+    """进程内指标聚合器
+
+    汇总消息与响应器的耗时直方图、响应结果计数，以及任务数与临时响应器数。
+
+    Attributes:
+        events (Histogram): 消息响应耗时
+        match (Histogram): 匹配指令耗时
+        handles (dict[tuple[str, str], dict[str, Histogram]]): 各响应器获取属性、运行、发送的耗时
+        outcomes (dict[tuple[str, str, str], int]): 各响应器的结果计数
+        matched (int): 被触发的响应器总数
+        responded (int): 返回结果的响应器总数
+        tasks (int): 最近一次记录的正在处理与排队等待的事件数
+        temp_handles (int): 最近一次记录的临时响应器数
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self.events = Histogram(buckets)
+        self.match = Histogram(buckets)
+        self.handles: dict[tuple[str, str], dict[str, Histogram]] = {}
+        self.outcomes: dict[tuple[str, str, str], int] = {}
+        self.matched: int = 0
+        self.responded: int = 0
+        self.tasks: int = 0
+        self.temp_handles: int = 0
+
+    def on_handle(self, trace: HandleTrace):
+        label = handle_label(trace.handle)
+        if (stages := self.handles.get(label)) is None:
+            stages = self.handles[label] = {stage: Histogram(self.buckets) for stage in ("fetch", "run", "send")}
+        stages["fetch"].observe(trace.fetch)
+        stages["run"].observe(trace.run)
+        if trace.error:
+            outcome = "error"
+        elif trace.block is None:
+            outcome = "none"
+        else:
+            stages["send"].observe(trace.send)
+            outcome = "block" if any(trace.block) else "pass"
+        key = (*label, outcome)
+        self.outcomes[key] = self.outcomes.get(key, 0) + 1
+
+    def on_event(self, trace: EventTrace):
+        self.events.observe(trace.total)
+        self.match.observe(trace.match)
+        self.matched += len(trace.handles)
+        self.responded += trace.count
+        self.tasks = trace.tasks
+        self.temp_handles = trace.temp_handles
+
+    @property
+    def info(self):
+        return {
+            "events": self.events.info,
+            "match": self.match.info,
+            "matched": self.matched,
+            "responded": self.responded,
+            "tasks": self.tasks,
+            "temp_handles": self.temp_handles,
+        }
+
+    def snapshot(self) -> dict:
+        """导出全部指标
+
+        Returns:
+            dict: 可以序列化为 JSON 的指标
+        """
+        return {
+            **self.info,
+            "buckets": list(self.buckets),
+            "events_buckets": self.events.counts,
+            "handles": [
+                {"plugin": plugin, "command": command, **{stage: histogram.info for stage, histogram in stages.items()}}
+                for (plugin, command), stages in self.handles.items()
+            ],
+            "outcomes": [
+                {"plugin": plugin, "command": command, "outcome": outcome, "count": count}
+                for (plugin, command, outcome), count in self.outcomes.items()
+            ],
+        }
+
+    def json(self) -> str:
+        """导出为 JSON"""
+        return json.dumps(self.snapshot(), ensure_ascii=False)
+
+    def prometheus(self) -> str:
+        """导出为 Prometheus 文本格式"""
+        lines = ["# TYPE clovers_event_seconds histogram"]
+        lines.extend(self.events.prometheus("clovers_event_seconds"))
+        lines.append("# TYPE clovers_match_seconds histogram")
+        lines.extend(self.match.prometheus("clovers_match_seconds"))
+        lines.append("# TYPE clovers_handle_seconds histogram")
+        for (plugin, command), stages in self.handles.items():
+            for stage, histogram in stages.items():
+                labels = f'plugin="{_escape(plugin)}",command="{_escape(command)}",stage="{stage}"'
+                lines.extend(histogram.prometheus("clovers_handle_seconds", labels))
+        lines.append("# TYPE clovers_handle_total counter")
+        for (plugin, command, outcome), count in self.outcomes.items():
+            lines.append(f'clovers_handle_total{{plugin="{_escape(plugin)}",command="{_escape(command)}",outcome="{outcome}"}} {count}')
+        lines.append("# TYPE clovers_matched_total counter")
+        lines.append(f"clovers_matched_total {self.matched}")
+        lines.append("# TYPE clovers_responded_total counter")
+        lines.append(f"clovers_responded_total {self.responded}")
+        lines.append("# TYPE clovers_tasks gauge")
+        lines.append(f"clovers_tasks {self.tasks}")
+        lines.append("# TYPE clovers_temp_handles gauge")
+        lines.append(f"clovers_temp_handles {self.temp_handles}")
+        return "\n".join(lines) + "\n"
+
+
+def emit(hooks: list[MetricsHook], method: str, trace):
+    for hook in hooks:
+        try:
+            getattr(hook, method)(trace)
+        except Exception:
+            logger.exception(f"[Clovers][CloversCore] metrics hook {hook!r} failed")
@@ -0,0 +1,128 @@
+import asyncio
+from time import monotonic
+from collections import deque
+from collections.abc import Callable, Hashable
+from typing import Any
+from ..base import Info, AdapterMethodLib
+from ..logger import logger
+
+type Destination = Callable[[dict], Hashable]
+
+
+class Outbox(Info):
+    """发送队列
+
+    响应结果放入发送队列后立即返回，由每个目标各自的后台任务按顺序发送，同一目标的消息保持入队顺序。
+
+    发送方法有同名的批量发送方法时，同一目标连续的同类消息会合并发送: 队首消息最多等待 window 秒收集后续消息，
+
+    一批最多 max_batch 条，批量发送方法的第一个参数为消息列表，额外参数使用这一批第一条消息的参数，
+
+    因此 destination 必须区分批量发送的实际目标（如群号或用户），不同目标的消息不会合并。
+
+    Attributes:
+        destination (Destination): 根据事件参数计算发送目标
+        window (float): 合并等待时间
+        max_batch (int): 单批最大消息数
+        sent (int): 已发送的消息数
+        batches (int): 批量发送次数
+        failed (int): 发送失败的消息数
+    """
+
+    def __init__(
+        self,
+        sends_lib: AdapterMethodLib[None],
+        batch_sends_lib: AdapterMethodLib[None],
+        destination: Destination,
+        window: float = 0.0,
+        max_batch: int = 20,
+    ) -> None:
+        self.sends_lib = sends_lib
+        self.batch_sends_lib = batch_sends_lib
+        self.destination = destination
+        self.window = window
+        self.max_batch = max_batch
+        self.sent: int = 0
+        self.batches: int = 0
+        self.failed: int = 0
+        self._queues: dict[Hashable, deque[tuple[str, Any, dict, float]]] = {}
+        self._workers: dict[Hashable, asyncio.Task] = {}
+
+    @property
+    def info(self):
+        return {
+            "destinations": len(self._queues),
+            "queued": sum(len(queue) for queue in self._queues.values()),
+            "sent": self.sent,
+            "batches": self.batches,
+            "failed": self.failed,
+        }
+
+    def put(self, key: str, data: Any, extra: dict):
+        """放入发送队列
+
+        Args:
+            key (str): 发送方法名
+            data (Any): 发送内容
+            extra (dict): 事件参数
+        """
+        # 发送方法不存在时与直接发送一样在响应器任务中抛出，而不是终止目标的发送任务
+        if key not in self.sends_lib:
+            raise KeyError(key)
+        destination = self.destination(extra)
+        if (queue := self._queues.get(destination)) is None:
+            queue = self._queues[destination] = deque()
+        queue.append((key, data, extra, monotonic()))
+        if destination not in self._workers:
+            self._workers[destination] = asyncio.create_task(self._drain(destination, queue))
+
+    async def _drain(self, destination: Hashable, queue: deque[tuple[str, Any, dict, float]]):
+        try:
+            while queue:
+                key, data, extra, queued = queue[0]
+                if (batch_method := self.batch_sends_lib.get(key)) is None:
+                    queue.popleft()
+                    await self._send(self.sends_lib[key], data, extra, 1)
+                    continue
+                if self.window > 0 and len(queue) < self.max_batch and (delay := queued + self.window - monotonic()) > 0:
+                    await asyncio.sleep(delay)
+                batch = []
+                while queue and queue[0][0] == key and len(batch) < self.max_batch:
+                    batch.append(queue.popleft()[1])
+                if len(batch) == 1:
+                    await self._send(self.sends_lib[key], data, extra, 1)
+                else:
+                    self.batches += 1
+                    await self._send(batch_method, batch, extra, len(batch))
+        finally:
+            del self._workers[destination]
+            if queue:
+                # 被取消时剩余的消息丢弃
+                self.failed += len(queue)
+                queue.clear()
+            del self._queues[destination]
+
+    async def _send(self, method: Callable, data: Any, extra: dict, count: int):
+        try:
+            await method(data, **extra)
+            self.sent += count
+        except Exception:
+            self.failed += count
+            logger.exception(f"[Clovers][Outbox] failed to send: {data}")
+
+    async def flush(self, timeout: float | None = None):
+        """等待发送队列清空
+
+        Args:
+            timeout (float | None): 等待时长，超时后取消剩余的发送
+        """
+        try:
+            async with asyncio.timeout(timeout):
+                while self._workers:
+                    await asyncio.gather(*self._workers.values(), return_exceptions=True)
+        except TimeoutError:
+            logger.warning(f"[Clovers][Outbox] {self.info['queued']} queued messages dropped on shutdown")
+            workers = list(self._workers.values())
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
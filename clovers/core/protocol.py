@@ -1,4 +1,5 @@
 import inspect
+from weakref import WeakKeyDictionary
 from types import UnionType
 from typing import get_origin, get_args, get_overloads, Union, Any, TypeVar, Literal, TypeAliasType, Optional, TypedDict
 from collections.abc import Callable, Generator, AsyncGenerator
@@ -6,6 +7,15 @@ from ..base import Coro
 from ..logger import logger
 
 
+_compatible_cache: dict[tuple[Any, Any], bool] = {}
+"""类型兼容检查结果缓存"""
+_checking: dict[tuple[Any, Any], int] = {}
+"""正在检查的类型对及其递归深度"""
+_NO_ASSUMPTION = 1 << 30
+_provisional = [_NO_ASSUMPTION]
+"""最浅的被假设兼容的递归深度，比它更深的结果都依赖假设"""
+
+
 def _is_union(type: Any):
     return type in (Union, UnionType)
 
@@ -59,6 +69,14 @@ def _flatten_type(T: Any) -> Any:
     return T, origin
 
 
+def _normalize(T: Any) -> Any:
+    """展开类型别名与 Optional，结果作为协议中保存的类型，便于命中兼容检查缓存"""
+    try:
+        return _flatten_type(T)[0]
+    except Exception:
+        return T
+
+
 def _literal_check(literal_args: tuple, check_T: Any, check_origin: Any) -> bool:
     if literal_args is ...:
         return False
@@ -162,6 +180,30 @@ def check_compatible(type_A: Any, type_B: Any) -> bool:
     Returns:
         bool: A 是 B 的兼容类型
     """
+    try:
+        key = (type_A, type_B)
+        if (result := _compatible_cache.get(key)) is not None:
+            return result
+    except TypeError:
+        # 含有不可哈希参数的类型不缓存
+        return _check_compatible(type_A, type_B)
+    if (depth := _checking.get(key)) is not None:
+        # 自引用的类型: 假设兼容，依赖该假设的结果在假设被验证前不缓存
+        _provisional[0] = min(_provisional[0], depth)
+        return True
+    depth = _checking[key] = len(_checking)
+    try:
+        result = _check_compatible(type_A, type_B)
+    finally:
+        del _checking[key]
+    if depth <= _provisional[0]:
+        _compatible_cache[key] = result
+        if depth == _provisional[0]:
+            _provisional[0] = _NO_ASSUMPTION
+    return result
+
+
+def _check_compatible(type_A: Any, type_B: Any) -> bool:
     if type_B is type_A:
         return True
     # if isinstance(type_B, EllipsisType):
@@ -213,6 +255,15 @@ def check_compatible(type_A: Any, type_B: Any) -> bool:
     return False
 
 
+_format_cache: WeakKeyDictionary[type, Any] = WeakKeyDictionary()
+"""插件类型协议格式化结果缓存"""
+
+
+def clear_compatible_cache():
+    """清空类型兼容检查的缓存"""
+    _compatible_cache.clear()
+
+
 def literal_arg(literal: type):
     origin = get_origin(literal)
     if not origin is Literal:
@@ -252,8 +303,28 @@ class TypeProtocol:
     def __bool__(self):
         return bool(self.__protocol["send"]) or bool(self.__protocol["call"])
 
+    @classmethod
+    def protocol_format(cls, protocol: type) -> __Protocol:
+        """格式化插件类型协议
+
+        同一个协议类型只会解析一次
+
+        Args:
+            protocol (type): 插件类型协议
+
+        Returns:
+            __Protocol: 调用与发送方法的类型
+        """
+        try:
+            if (result := _format_cache.get(protocol)) is not None:
+                return result
+        except TypeError:
+            return cls._protocol_format(protocol)
+        result = _format_cache[protocol] = cls._protocol_format(protocol)
+        return result
+
     @staticmethod
-    def protocol_format(protocol: type) -> __Protocol:
+    def _protocol_format(protocol: type) -> __Protocol:
         calls = {k: v for k, v in protocol.__annotations__.items() if not k.startswith("_")}
         sends = {}
         attr = getattr(protocol, "call", None)
@@ -291,7 +362,7 @@ class TypeProtocol:
                 if (literal_args := literal_arg(fields[key_name])) is None:
                     continue
                 sends[literal_args[0]] = fields[message_name]
-        return {"call": calls, "send": sends}
+        return {"call": {k: _normalize(v) for k, v in calls.items()}, "send": {k: _normalize(v) for k, v in sends.items()}}
 
     def check(self, protocol: type | None):
         """检查适配器类型协议
@@ -319,7 +390,7 @@ class TypeProtocol:
     def register_send(self, key: str, send: Callable):
         first_param = next(iter(inspect.signature(send).parameters.values()), None)
         if first_param and first_param.annotation is not inspect.Parameter.empty:
-            self.__protocol["send"][key] = first_param.annotation
+            self.__protocol["send"][key] = _normalize(first_param.annotation)
 
     def register_call(self, key: str, call: Callable):
         sig = inspect.signature(call)
@@ -328,7 +399,7 @@ class TypeProtocol:
             return
         params = [p for p in sig.parameters.values() if p.kind == inspect.Parameter.POSITIONAL_ONLY]
         if not params:
-            self.__protocol["call"][key] = return_annot
+            self.__protocol["call"][key] = _normalize(return_annot)
             return
         arg_types = [p.annotation for p in params]
         if any(annot is inspect.Parameter.empty for annot in arg_types):
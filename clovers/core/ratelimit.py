@@ -0,0 +1,177 @@
+import asyncio
+from time import monotonic
+from functools import update_wrapper
+from collections.abc import Hashable
+from ..base import Info, AdapterMethod
+from .outbox import Destination
+
+
+class TokenBucket:
+    """令牌桶
+
+    按预约计算等待时间: 令牌不足时余量记为负数，调用方等待到自己的令牌生成，先预约的先发送。
+
+    Attributes:
+        rate (float): 每秒生成的令牌数
+        burst (int): 桶容量
+        tokens (float): 当前令牌数
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: int, now: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens: float = burst
+        self.updated: float = now
+
+    def reserve(self, now: float) -> float:
+        """预约一个令牌
+
+        Args:
+            now (float): 当前时间
+
+        Returns:
+            float: 需要等待的时长
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def idle(self, now: float) -> bool:
+        """令牌是否已经补满"""
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+
+class RateRule(Info):
+    """限速规则
+
+    Attributes:
+        key (str | None): 发送方法名，为 None 时限制全部发送方法
+        rate (float): 每秒发送次数
+        burst (int): 允许的突发次数
+        per_destination (bool): 是否每个发送目标单独计算
+        count (int): 经过的发送次数
+        delayed (int): 被延迟的发送次数
+        wait (float): 累计等待时长
+        wait_max (float): 最大等待时长
+    """
+
+    def __init__(self, key: str | None, rate: float, burst: int, per_destination: bool) -> None:
+        if rate <= 0:
+            raise ValueError(f"Invalid rate: {rate}")
+        self.key = key
+        self.rate = rate
+        self.burst = burst
+        self.per_destination = per_destination
+        self.count: int = 0
+        self.delayed: int = 0
+        self.wait: float = 0.0
+        self.wait_max: float = 0.0
+        self._buckets: dict[Hashable, TokenBucket] = {}
+
+    @property
+    def info(self):
+        return {
+            "key": self.key,
+            "rate": self.rate,
+            "burst": self.burst,
+            "per_destination": self.per_destination,
+            "buckets": len(self._buckets),
+            "count": self.count,
+            "delayed": self.delayed,
+            "wait_avg": self.wait / (self.count or 1),
+            "wait_max": self.wait_max,
+        }
+
+    def reserve(self, destination: Hashable, now: float) -> float:
+        if not self.per_destination:
+            destination = None
+        if (bucket := self._buckets.get(destination)) is None:
+            if len(self._buckets) >= 4096:
+                # 清理已经补满的目标
+                self._buckets = {k: v for k, v in self._buckets.items() if not v.idle(now)}
+            bucket = self._buckets[destination] = TokenBucket(self.rate, self.burst, now)
+        return bucket.reserve(now)
+
+    def record(self, delay: float):
+        self.count += 1
+        if delay > 0:
+            self.delayed += 1
+            self.wait += delay
+            self.wait_max = max(self.wait_max, delay)
+
+
+class RateLimiter(Info):
+    """发送限速器
+
+    发送前向全部匹配的规则预约令牌，等待到最晚的一个令牌生成后再发送，超出速率的发送会被推迟而不是丢弃。
+
+    各规则分别记录自己造成的等待时长。批量发送方法与同名发送方法使用相同的规则，每批消耗一个令牌。
+
+    Attributes:
+        destination (Destination | None): 根据事件参数计算发送目标
+        rules (list[RateRule]): 限速规则
+    """
+
+    def __init__(self, destination: Destination | None = None) -> None:
+        self.destination = destination
+        self.rules: list[RateRule] = []
+
+    @property
+    def info(self):
+        return {"rules": [rule.info for rule in self.rules]}
+
+    def limit(self, key: str | None = None, rate: float = 1.0, burst: int = 1, per_destination: bool = False) -> RateRule:
+        """添加限速规则
+
+        Args:
+            key (str | None): 发送方法名，为 None 时限制全部发送方法
+            rate (float): 每秒发送次数
+            burst (int): 允许的突发次数
+            per_destination (bool): 是否每个发送目标单独计算
+
+        Returns:
+            RateRule: 限速规则
+        """
+        rule = RateRule(key, rate, burst, per_destination)
+        self.rules.append(rule)
+        return rule
+
+    async def acquire(self, key: str, extra: dict):
+        """等待发送许可
+
+        Args:
+            key (str): 发送方法名
+            extra (dict): 事件参数
+        """
+        rules = [rule for rule in self.rules if rule.key is None or rule.key == key]
+        if not rules:
+            return
+        now = monotonic()
+        destination = None if self.destination is None else self.destination(extra)
+        delay = 0.0
+        for rule in rules:
+            rule.record(wait := rule.reserve(destination, now))
+            delay = max(delay, wait)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def wrap(self, key: str, func: AdapterMethod) -> AdapterMethod:
+        """包装发送方法，发送前等待许可
+
+        Args:
+            key (str): 发送方法名
+            func (AdapterMethod): 发送方法
+
+        Returns:
+            AdapterMethod: 限速的发送方法
+        """
+
+        async def wrapper(data, **extra):
+            await self.acquire(key, extra)
+            return await func(data, **extra)
+
+        update_wrapper(wrapper, func)
+        return wrapper
@@ -0,0 +1,40 @@
+from collections.abc import Callable, Iterable
+
+
+def resolve[T](nodes: Iterable[T], edges: Callable[[T], Iterable[T]]) -> tuple[list[T], list[list[T]]]:
+    """依赖排序
+
+    深度优先遍历依赖图，依赖总是排在依赖它的节点之前，同层按输入顺序排列。
+
+    Args:
+        nodes (Iterable[T]): 节点
+        edges (Callable[[T], Iterable[T]]): 获取节点的依赖
+
+    Returns:
+        tuple[list[T], list[list[T]]]: (排序结果, 发现的循环依赖)
+    """
+    order: list[T] = []
+    cycles: list[list[T]] = []
+    done: set[T] = set()
+    path: list[T] = []
+    on_path: set[T] = set()
+
+    def visit(node: T):
+        path.append(node)
+        on_path.add(node)
+        for dep in edges(node):
+            if dep in done:
+                continue
+            if dep in on_path:
+                cycles.append(path[path.index(dep) :])
+                continue
+            visit(dep)
+        on_path.discard(node)
+        path.pop()
+        done.add(node)
+        order.append(node)
+
+    for node in nodes:
+        if node not in done:
+            visit(node)
+    return order, cycles
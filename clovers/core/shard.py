@@ -0,0 +1,470 @@
+import asyncio
+import threading
+import multiprocessing
+from abc import abstractmethod
+from itertools import count
+from time import monotonic
+from types import NoneType
+from collections import deque
+from collections.abc import Callable, Hashable
+from multiprocessing.connection import Connection
+from typing import Any
+from .core import AdapterCore, CloversCore, CloversCoreInterface
+from ..logger import logger
+
+EVENT_ID = "__clovers_event__"
+"""子进程事件参数中的事件编号"""
+
+_SHARED_TYPES = (str, int, float, bool, bytes, NoneType)
+
+
+def _shard_main(build_core: Callable[[], CloversCore], conn: Connection):
+    asyncio.run(_shard_run(build_core, conn))
+
+
+async def _shard_run(build_core: Callable[[], CloversCore], conn: Connection):
+    """分片进程
+
+    适配器方法被替换为代理，发送、批量发送与调用都经管道交给主进程执行，限速器仍在分片中生效
+    """
+    loop = asyncio.get_running_loop()
+    core = build_core()
+    requests: dict[int, asyncio.Future] = {}
+    counter = count()
+    stopped = loop.create_future()
+
+    def proxy_send(kind: str, key: str):
+        async def send(data, **extra):
+            conn.send((kind, extra[EVENT_ID], key, data))
+
+        return send if (ratelimit := core.adapter.ratelimit) is None else ratelimit.wrap(key, send)
+
+    def proxy_call(key: str):
+        async def call(*args, **extra):
+            requests[request := next(counter)] = future = loop.create_future()
+            conn.send(("call", request, extra[EVENT_ID], key, args))
+            return await future
+
+        return call
+
+    for key in core.adapter.sends_lib:
+        core.adapter.sends_lib[key] = proxy_send("send", key)
+    for key in core.adapter.batch_sends_lib:
+        core.adapter.batch_sends_lib[key] = proxy_send("batch", key)
+    for key in core.adapter.calls_lib:
+        core.adapter.calls_lib[key] = proxy_call(key)
+
+    async def respond(event_id: int, message: str, extra: dict):
+        try:
+            result = await core.response_message(message, **extra, **{EVENT_ID: event_id})
+        except Exception:
+            logger.exception(f"[Clovers][CloversShardedCore] failed to respond message: {message}")
+            result = 0
+        conn.send(("done", event_id, result))
+
+    def stop():
+        if not stopped.done():
+            stopped.set_result(None)
+
+    def on_message(data: tuple):
+        match data:
+            case ("event", event_id, message, extra):
+                core.create_task(respond(event_id, message, extra))
+            case ("result", request, ok, value):
+                if (future := requests.pop(request, None)) is None or future.done():
+                    return
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+            case ("ping",):
+                conn.send(("pong",))
+            case ("stop",):
+                stop()
+
+    def reader():
+        try:
+            while True:
+                loop.call_soon_threadsafe(on_message, conn.recv())
+        except (EOFError, OSError):
+            loop.call_soon_threadsafe(stop)
+
+    await core.startup()
+    threading.Thread(target=reader, daemon=True).start()
+    conn.send(("ready",))
+    await stopped
+    await core.shutdown()
+
+
+class Shard:
+    """分片进程状态
+
+    Attributes:
+        index (int): 分片序号
+        process (multiprocessing.Process | None): 分片进程，重启等待期间为 None
+        conn (Connection | None): 与分片进程通信的管道
+        ready (asyncio.Future[None]): 分片是否完成启动
+        last_seen (float): 最后一次收到分片消息的时间
+        events (set[int]): 分片正在处理的事件编号
+    """
+
+    def __init__(self, index: int, ready: asyncio.Future[None]) -> None:
+        self.index = index
+        self.process = None
+        self.conn: Connection | None = None
+        self.ready = ready
+        self.closed: bool = False
+        self.last_seen: float = monotonic()
+        self.events: set[int] = set()
+        self.backlog: deque[tuple] = deque()
+        """启动完成前派发的事件"""
+
+    @property
+    def info(self):
+        if self.process is None:
+            return {"index": self.index, "pid": None, "alive": False, "inflight": len(self.events)}
+        return {"index": self.index, "pid": self.process.pid, "alive": self.process.is_alive(), "inflight": len(self.events)}
+
+
+class CloversShardedCore(CloversCoreInterface):
+    """多进程 clovers 框架
+
+    每个分片进程使用 build_core 构建独立的 CloversCore 并运行在自己的事件循环中，主进程按 shard_key 把事件派发到分片。
+
+    分片的适配器发送与调用方法经管道代理回主进程的适配器执行，事件参数保留在主进程，只有 share_extra 选出的参数会传给分片。
+
+    build_core 必须可以被 pickle，即模块顶层定义的函数。
+
+    Args:
+        name (str): 项目名
+        build_core (Callable[[], CloversCore]): 在分片进程中构建 clovers 核心
+        shards (int): 分片数量
+        start_method (str | None): 进程启动方式，默认使用平台默认方式
+    """
+
+    def __init__(self, name: str, build_core: Callable[[], CloversCore], shards: int = 2, start_method: str | None = None) -> None:
+        self.adapter = AdapterCore(name)
+        self.build_core = build_core
+        self.shards = shards
+        self.health_interval: float = 5.0
+        """健康检查间隔，为 0 时不检查"""
+        self.health_timeout: float = 15.0
+        """分片超过此时长没有任何消息时视为无响应并重启"""
+        self.startup_timeout: float = 60.0
+        """等待分片启动的时长"""
+        self.restart_delay: float = 1.0
+        """分片重启前等待的时长，避免启动即崩溃的分片频繁重启"""
+        self.restarts: int = 0
+        """分片重启次数"""
+        self.send_linger: float = 30.0
+        """事件响应完成后保留事件参数的时长，分片中延迟的发送（发送队列、限速、后台任务）在此期间仍会送达"""
+        self._context = multiprocessing.get_context(start_method)
+        self._shards: list[Shard] = []
+        self._inflight: dict[int, tuple[Shard, dict, asyncio.Future[int]]] = {}
+        self._finished: dict[int, tuple[float, dict]] = {}
+        self._counter = count()
+        self._tasks: set[asyncio.Task] = set()
+        self._monitor: asyncio.Task | None = None
+        self._ready: bool = False
+
+    @property
+    def info(self):
+        return {"adapter": self.adapter.info, "shards": [shard.info for shard in self._shards], "restarts": self.restarts}
+
+    @property
+    def is_ready(self) -> bool:
+        return self._ready
+
+    def load_adapter(self, adapter_list: list[str] | None = None, adapter_dirs: list[str] | None = None, workers: int = 0):
+        """加载主进程的 clovers 适配器，分片的发送与调用由这些适配器执行
+
+        Args:
+            adapter_list (list[str]): 适配器的包名列表
+            adapter_dirs (list[str]): 适配器的目录列表
+            workers (int): 并发导入的线程数
+        """
+        if adapter_list:
+            self.adapter.load_from_list(adapter_list, workers)
+        if adapter_dirs:
+            self.adapter.load_from_dirs(adapter_dirs, workers)
+
+    @abstractmethod
+    def extract_message(self, **extra) -> str | None:
+        """提取消息
+
+        Args:
+            **extra: 额外的参数
+
+        Returns:
+            Optional[str]: 消息
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def shard_key(self, **extra) -> Hashable:
+        """计算分片键，相同分片键的事件总是由同一个分片处理
+
+        Args:
+            **extra: 额外的参数
+
+        Returns:
+            Hashable: 分片键
+        """
+        raise NotImplementedError
+
+    def share_extra(self, extra: dict) -> dict:
+        """选出传给分片的事件参数，默认为基本类型的参数
+
+        Args:
+            extra (dict): 事件参数
+
+        Returns:
+            dict: 传给分片的参数
+        """
+        return {k: v for k, v in extra.items() if isinstance(v, _SHARED_TYPES)}
+
+    def create_task(self, coro):
+        self._tasks.add(task := asyncio.create_task(coro))
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _spawn(self, index: int) -> Shard:
+        shard = Shard(index, asyncio.get_running_loop().create_future())
+        self._launch(shard)
+        return shard
+
+    def _launch(self, shard: Shard):
+        loop = asyncio.get_running_loop()
+        shard.conn, child_conn = self._context.Pipe()
+        name = f"clovers-shard-{shard.index}"
+        shard.process = self._context.Process(target=_shard_main, args=(self.build_core, child_conn), name=name, daemon=True)
+        shard.process.start()
+        child_conn.close()
+        threading.Thread(target=self._reader, args=(shard, shard.conn, loop), name=f"{name}-reader", daemon=True).start()
+
+    def _reader(self, shard: Shard, conn: Connection, loop: asyncio.AbstractEventLoop):
+        try:
+            while True:
+                loop.call_soon_threadsafe(self._on_message, shard, conn.recv())
+        except (EOFError, OSError):
+            loop.call_soon_threadsafe(self._on_lost, shard)
+
+    def _on_message(self, shard: Shard, data: tuple):
+        shard.last_seen = monotonic()
+        match data:
+            case ("send" | "batch" as kind, event_id, key, message):
+                if (extra := self._extra(event_id)) is None:
+                    logger.warning(f"[Clovers][CloversShardedCore] {kind} {key} of expired event {event_id} dropped: {message}")
+                    return
+                if kind == "send":
+                    if (method := self.adapter.sends_lib.get(key)) is None:
+                        logger.warning(f"[Clovers][CloversShardedCore] send method {key} is missing")
+                        return
+                    self.create_task(self._send(method, message, extra))
+                elif (method := self.adapter.batch_sends_lib.get(key)) is not None:
+                    self.create_task(self._send(method, message, extra))
+                elif (method := self.adapter.sends_lib.get(key)) is not None:
+                    # 主进程没有批量发送方法时逐条发送
+                    for item in message:
+                        self.create_task(self._send(method, item, extra))
+                else:
+                    logger.warning(f"[Clovers][CloversShardedCore] send method {key} is missing")
+            case ("call", request, event_id, key, args):
+                self.create_task(self._call(shard, request, event_id, key, args))
+            case ("done", event_id, result):
+                if (item := self._inflight.pop(event_id, None)) is None:
+                    return
+                shard.events.discard(event_id)
+                self._expire()
+                if self.send_linger > 0:
+                    self._finished[event_id] = (monotonic() + self.send_linger, item[1])
+                if not item[2].done():
+                    item[2].set_result(result)
+            case ("ready",):
+                if not shard.ready.done():
+                    shard.ready.set_result(None)
+                while shard.backlog and self._post(shard, shard.backlog[0]):
+                    shard.backlog.popleft()
+            case ("pong",):
+                pass
+
+    def _extra(self, event_id: int) -> dict | None:
+        if (item := self._inflight.get(event_id)) is not None:
+            return item[1]
+        if (finished := self._finished.get(event_id)) is not None:
+            return finished[1]
+
+    def _expire(self):
+        now = monotonic()
+        expired = []
+        for event_id, (deadline, _) in self._finished.items():
+            if deadline > now:
+                break
+            expired.append(event_id)
+        for event_id in expired:
+            del self._finished[event_id]
+
+    async def _send(self, method: Callable, message: Any, extra: dict):
+        try:
+            await method(message, **extra)
+        except Exception:
+            logger.exception(f"[Clovers][CloversShardedCore] failed to send message: {message}")
+
+    async def _call(self, shard: Shard, request: int, event_id: int, key: str, args: tuple):
+        try:
+            if (extra := self._extra(event_id)) is None:
+                raise RuntimeError(f"event {event_id} is not in flight")
+            reply = ("result", request, True, await self.adapter.calls_lib[key](*args, **extra))
+        except Exception as e:
+            reply = ("result", request, False, e)
+        if shard.closed:
+            return
+        try:
+            shard.conn.send(reply)
+        except OSError:
+            return
+        except Exception as e:
+            # 返回值或异常无法 pickle
+            shard.conn.send(("result", request, False, RuntimeError(repr(e))))
+
+    def _post(self, shard: Shard, data: tuple) -> bool:
+        try:
+            shard.conn.send(data)  # type: ignore
+            return True
+        except OSError:
+            self._on_lost(shard)
+            return False
+
+    def _on_lost(self, shard: Shard):
+        if shard.closed:
+            return
+        if not shard.ready.done():
+            shard.ready.set_exception(RuntimeError(f"shard {shard.index} exited during startup"))
+        if self._ready:
+            self.create_task(self._restart(shard))
+
+    def _drop_events(self, shard: Shard):
+        if shard.events:
+            logger.warning(f"[Clovers][CloversShardedCore] {len(shard.events)} events dropped by shard {shard.index}")
+        for event_id in shard.events:
+            if (item := self._inflight.pop(event_id, None)) is not None:
+                item[2].cancel()
+        shard.events.clear()
+        shard.backlog.clear()
+
+    async def _close(self, shard: Shard, timeout: float):
+        shard.closed = True
+        if (process := shard.process) is not None:
+            await asyncio.to_thread(process.join, timeout)
+            if process.is_alive():
+                process.kill()
+                await asyncio.to_thread(process.join)
+        if shard.conn is not None:
+            shard.conn.close()
+        self._drop_events(shard)
+
+    async def _restart(self, shard: Shard):
+        if shard.closed:
+            return
+        # 立即换上新分片，重启期间派发的事件以及旧分片尚未发出的事件进入新分片的启动队列
+        self._shards[shard.index] = new = Shard(shard.index, asyncio.get_running_loop().create_future())
+        new.backlog, shard.backlog = shard.backlog, new.backlog
+        for data in new.backlog:
+            shard.events.discard(event_id := data[1])
+            new.events.add(event_id)
+            self._inflight[event_id] = (new, *self._inflight[event_id][1:])
+        await self._close(shard, 0)
+        exitcode = None if shard.process is None else shard.process.exitcode
+        logger.warning(f"[Clovers][CloversShardedCore] shard {shard.index} is unhealthy (exitcode: {exitcode}), restarting")
+        await asyncio.sleep(self.restart_delay)
+        if not self._ready or new.closed:
+            return
+        self._launch(new)
+        self.restarts += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(new.ready), self.startup_timeout)
+        except TimeoutError:
+            logger.error(f"[Clovers][CloversShardedCore] shard {shard.index} did not start in {self.startup_timeout}s")
+            await self._restart(new)
+        except Exception:
+            # 启动期间退出，_on_lost 已安排重启
+            logger.exception(f"[Clovers][CloversShardedCore] shard {shard.index} failed to restart")
+
+    async def _health(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            now = monotonic()
+            for shard in self._shards:
+                if shard.closed or not shard.ready.done():
+                    continue
+                if not shard.process.is_alive() or now - shard.last_seen > self.health_timeout:
+                    self.create_task(self._restart(shard))
+                else:
+                    self._post(shard, ("ping",))
+
+    async def startup(self):
+        """启动全部分片进程"""
+        if self._ready:
+            raise RuntimeError("Client is already running")
+        self._shards = [self._spawn(i) for i in range(self.shards)]
+        try:
+            await asyncio.wait_for(asyncio.gather(*(shard.ready for shard in self._shards)), self.startup_timeout)
+        except BaseException:
+            await asyncio.gather(*(self._close(shard, 0) for shard in self._shards))
+            self._shards = []
+            raise
+        self._ready = True
+        self.dispatch = self._dispatch_active
+        if self.health_interval > 0:
+            self._monitor = asyncio.create_task(self._health())
+
+    async def shutdown(self, timeout: float = 10.0):
+        """关闭全部分片进程
+
+        Args:
+            timeout (float): 等待分片进程结束的时长，超时后强制结束
+        """
+        if not self._ready:
+            raise RuntimeError("Client is not running")
+        self._ready = False
+        self.dispatch = self._dispatch_inactive
+        if self._monitor is not None:
+            self._monitor.cancel()
+            self._monitor = None
+        for shard in self._shards:
+            if not shard.closed and shard.conn is not None:
+                self._post(shard, ("stop",))
+        await asyncio.gather(*(self._close(shard, timeout) for shard in self._shards if not shard.closed))
+        if self._tasks:
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._shards = []
+        self._finished.clear()
+
+    def dispatch(self, **extra) -> asyncio.Future[int] | None:
+        """响应事件
+
+        Args:
+            **extra: 额外的参数
+
+        Returns:
+            asyncio.Future[int] | None: 分片响应数量，分片崩溃时被取消
+        """
+        raise RuntimeError("You must call 'await startup()' before dispatching events.")
+
+    def _dispatch_inactive(self, **extra): ...
+
+    def _dispatch_active(self, **extra):
+        if (message := self.extract_message(**extra)) is None:
+            return
+        shard = self._shards[hash(self.shard_key(**extra)) % len(self._shards)]
+        event_id = next(self._counter)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[event_id] = (shard, extra, future)
+        shard.events.add(event_id)
+        data = ("event", event_id, message, self.share_extra(extra))
+        # 发送失败的事件留在启动队列，由重启后的分片处理
+        if not shard.ready.done() or not self._post(shard, data):
+            shard.backlog.append(data)
+        return future
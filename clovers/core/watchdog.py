@@ -0,0 +1,133 @@
+import io
+import asyncio
+from time import perf_counter
+from collections import Counter
+from collections.abc import Callable
+from typing import Any, Literal
+from .metrics import handle_label
+from ..base import Coro, Info, BaseHandle
+from ..logger import logger
+
+type OverrunAction = Literal["log", "timeout", "detach"]
+
+
+class Watchdog(Info):
+    """响应器看门狗
+
+    记录运行超出预算的响应器，超时后按 action 处理:
+
+        log: 只记录，继续等待响应器
+        timeout: 取消响应器，视为没有响应
+        detach: 不再等待响应器，响应器在后台继续运行并发送结果，但不再参与阻断判断
+
+    profile_interval 大于 0 时，超时的响应器每隔 profile_interval 秒采样一次调用栈，直到结束或采样数达到 max_samples。
+
+    Attributes:
+        budget (float): 运行预算（秒）
+        action (OverrunAction): 超时处理方式
+        profile_interval (float): 调用栈采样间隔，为 0 时不采样
+        max_samples (int): 单次超时的最大采样数
+        overruns (Counter[tuple[str, str]]): 各响应器的超时次数
+        samples (dict[tuple[str, str], Counter[str]]): 各响应器的调用栈采样
+    """
+
+    def __init__(self, budget: float = 1.0, action: OverrunAction = "log", profile_interval: float = 0.0, max_samples: int = 100) -> None:
+        if action not in ("log", "timeout", "detach"):
+            raise ValueError(f"Invalid overrun action: {action}")
+        self.budget = budget
+        self.action: OverrunAction = action
+        self.profile_interval = profile_interval
+        self.max_samples = max_samples
+        self.overruns: Counter[tuple[str, str]] = Counter()
+        self.samples: dict[tuple[str, str], Counter[str]] = {}
+
+    @property
+    def info(self):
+        return {
+            "budget": self.budget,
+            "action": self.action,
+            "overruns": [{"plugin": plugin, "command": command, "count": count} for (plugin, command), count in self.overruns.items()],
+        }
+
+    def hotspots(self, limit: int = 5) -> dict[tuple[str, str], list[tuple[str, int]]]:
+        """各响应器采样次数最多的调用栈
+
+        Args:
+            limit (int): 每个响应器返回的调用栈数量
+
+        Returns:
+            dict[tuple[str, str], list[tuple[str, int]]]: (插件名, 指令) -> [(调用栈, 采样次数)]
+        """
+        return {label: samples.most_common(limit) for label, samples in self.samples.items()}
+
+    def _overrun(self, handle: BaseHandle, task: asyncio.Task, start: float):
+        label = handle_label(handle)
+        self.overruns[label] += 1
+        logger.warning(
+            f'[Clovers][Watchdog] handle {label[1]} of plugin "{label[0]}" exceeded its budget {self.budget}s '
+            f"({perf_counter() - start:.3f}s, action: {self.action})"
+        )
+        if self.profile_interval > 0:
+            self._sample(label, task, self.max_samples)
+
+    def _sample(self, label: tuple[str, str], task: asyncio.Task, remaining: int):
+        if task.done() or remaining <= 0:
+            return
+        buffer = io.StringIO()
+        task.print_stack(file=buffer)
+        # 去掉首行的任务描述，相同调用栈合并计数
+        stack = buffer.getvalue().split("\n", 1)[-1]
+        self.samples.setdefault(label, Counter())[stack] += 1
+        asyncio.get_running_loop().call_later(self.profile_interval, self._sample, label, task, remaining - 1)
+
+    def _detached(self, handle: BaseHandle, start: float):
+        def callback(task: asyncio.Task):
+            if task.cancelled():
+                return
+            if (e := task.exception()) is not None:
+                logger.error(f"[Clovers][Watchdog] detached handle failed: {e!r}")
+                return
+            label = handle_label(handle)
+            logger.info(f'[Clovers][Watchdog] detached handle {label[1]} of plugin "{label[0]}" finished in {perf_counter() - start:.3f}s')
+
+        return callback
+
+    async def run(self, handle: BaseHandle, coro: Coro[Any], spawn: Callable[[Coro], asyncio.Task]) -> Any:
+        """在预算内运行响应器
+
+        Args:
+            handle (BaseHandle): 响应器
+            coro (Coro[Any]): 响应器的运行协程
+            spawn (Callable[[Coro], asyncio.Task]): detach 时创建后台任务的方法
+
+        Returns:
+            Any: 响应器的结果，超时取消或脱离时返回 None
+        """
+        start = perf_counter()
+        loop = asyncio.get_running_loop()
+        if self.action == "detach":
+            task = spawn(coro)
+            done, _ = await asyncio.wait((task,), timeout=self.budget)
+            if done:
+                return task.result()
+            self._overrun(handle, task, start)
+            task.add_done_callback(self._detached(handle, start))
+            return None
+        task: asyncio.Task = asyncio.current_task()  # type: ignore
+        if self.action == "log":
+            timer = loop.call_later(self.budget, self._overrun, handle, task, start)
+            try:
+                return await coro
+            finally:
+                timer.cancel()
+        cm = asyncio.timeout(None)
+        # 先记录并采样调用栈，再取消响应器
+        timer = loop.call_later(self.budget, lambda: (self._overrun(handle, task, start), cm.reschedule(loop.time())))
+        try:
+            async with cm:
+                return await coro
+        except TimeoutError:
+            if not cm.expired():
+                raise
+        finally:
+            timer.cancel()
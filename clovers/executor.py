@@ -0,0 +1,139 @@
+import asyncio
+from time import time
+from typing import Any, Literal
+from collections.abc import Callable
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from .base import Info
+from .config import Config
+
+type ExecutorKind = Literal["thread", "process"]
+
+
+def _timed(func: Callable[[Any], Any], arg: Any, build: Callable[[Any], Any] | None):
+    start = time()
+    result = func(arg if build is None else build(arg))
+    return start, time(), result
+
+
+class ExecutorStats:
+    """同步响应器的执行耗时
+
+    Attributes:
+        count (int): 执行次数
+        wait (float): 累计排队耗时
+        wait_max (float): 最大排队耗时
+        run (float): 累计运行耗时
+        run_max (float): 最大运行耗时
+    """
+
+    __slots__ = ("count", "wait", "wait_max", "run", "run_max")
+
+    def __init__(self) -> None:
+        self.count: int = 0
+        self.wait: float = 0.0
+        self.wait_max: float = 0.0
+        self.run: float = 0.0
+        self.run_max: float = 0.0
+
+    def record(self, wait: float, run: float):
+        self.count += 1
+        self.wait += wait
+        self.run += run
+        self.wait_max = max(self.wait_max, wait)
+        self.run_max = max(self.run_max, run)
+
+    @property
+    def info(self):
+        count = self.count or 1
+        return {
+            "count": self.count,
+            "wait_avg": self.wait / count,
+            "wait_max": self.wait_max,
+            "run_avg": self.run / count,
+            "run_max": self.run_max,
+        }
+
+
+class HandleExecutor(Info):
+    """同步响应器执行器
+
+    线程池与进程池在第一次使用时创建，未指定大小时从配置文件的 [clovers] 读取 thread_workers 与 process_workers，
+
+    配置中也没有时使用 concurrent.futures 的默认大小。
+
+    Attributes:
+        thread_workers (int | None): 线程池大小
+        process_workers (int | None): 进程池大小
+        stats (dict[str, ExecutorStats]): 各响应器的执行耗时
+    """
+
+    def __init__(self, thread_workers: int | None = None, process_workers: int | None = None) -> None:
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers
+        self.stats: dict[str, ExecutorStats] = {}
+        self._pools: dict[ExecutorKind, Executor] = {}
+
+    @property
+    def info(self):
+        return {
+            "thread_workers": self.thread_workers,
+            "process_workers": self.process_workers,
+            "handles": {name: stats.info for name, stats in self.stats.items()},
+        }
+
+    def pool(self, kind: ExecutorKind) -> Executor:
+        """获取执行池
+
+        Args:
+            kind (ExecutorKind): 执行池类型
+
+        Returns:
+            Executor: 执行池
+        """
+        if (pool := self._pools.get(kind)) is not None:
+            return pool
+        config = Config.environ().get("clovers", {})
+        match kind:
+            case "thread":
+                if self.thread_workers is None:
+                    self.thread_workers = config.get("thread_workers")
+                pool = ThreadPoolExecutor(self.thread_workers, thread_name_prefix="clovers-handle")
+            case "process":
+                if self.process_workers is None:
+                    self.process_workers = config.get("process_workers")
+                pool = ProcessPoolExecutor(self.process_workers)
+            case _:
+                raise ValueError(f"Invalid executor: {kind}")
+        self._pools[kind] = pool
+        return pool
+
+    async def run(self, kind: ExecutorKind, func: Callable[[Any], Any], arg: Any, build: Callable[[Any], Any] | None = None) -> Any:
+        """在执行池中运行同步响应器
+
+        Args:
+            kind (ExecutorKind): 执行池类型
+            func (Callable[[Any], Any]): 同步响应器
+            arg (Any): 响应器参数
+            build (Callable[[Any], Any] | None): 在执行池中把参数转换为响应器的参数
+
+        Returns:
+            Any: 响应器返回值
+        """
+        submitted = time()
+        start, end, result = await asyncio.get_running_loop().run_in_executor(self.pool(kind), _timed, func, arg, build)
+        name = f"{func.__module__}.{func.__qualname__}"
+        if (stats := self.stats.get(name)) is None:
+            stats = self.stats[name] = ExecutorStats()
+        stats.record(start - submitted, end - start)
+        return result
+
+    def shutdown(self, wait: bool = True):
+        """关闭全部执行池，之后再次使用时重新创建
+
+        Args:
+            wait (bool): 是否等待正在运行的响应器结束
+        """
+        pools = list(self._pools.values())
+        self._pools.clear()
+        for pool in pools:
+            pool.shutdown(wait, cancel_futures=True)
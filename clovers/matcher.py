@@ -0,0 +1,153 @@
+import re
+from typing import Any
+from collections.abc import Generator, Iterable
+
+_UNSAFE_REGEX = re.compile(r"\\[1-9]|\(\?P=|\(\?\(")
+"""含有反向引用或条件分组的正则无法安全合并"""
+
+
+def fusible(pattern: re.Pattern[str]) -> bool:
+    """判断正则能否与其他正则合并为一个分支表达式
+
+    Args:
+        pattern (re.Pattern[str]): 正则
+
+    Returns:
+        bool: 能否合并
+    """
+    if pattern.flags != re.UNICODE or pattern.groupindex:
+        return False
+    return _UNSAFE_REGEX.search(pattern.pattern) is None
+
+
+class CommandTrie[T]:
+    """指令前缀树
+
+    按字符存储指令，沿消息逐字查找所有作为消息前缀的指令
+    """
+
+    __slots__ = ("_root",)
+
+    _VALUES = ""
+    """节点值的存储键，空字符串不会与任何单个字符冲突"""
+
+    def __init__(self) -> None:
+        self._root: dict = {}
+
+    def insert(self, command: str, value: T):
+        """插入指令
+
+        Args:
+            command (str): 指令
+            value (T): 指令对应的值
+        """
+        node = self._root
+        for char in command:
+            node = node.setdefault(char, {})
+        node.setdefault(self._VALUES, []).append(value)
+
+    def prefixes(self, message: str) -> Generator[tuple[int, list[T]], None, None]:
+        """查找消息的全部指令前缀
+
+        Args:
+            message (str): 待匹配的消息
+
+        Yields:
+            tuple[int, list[T]]: 按长度升序生成 (指令长度, 指令对应的值)
+        """
+        node = self._root
+        if (values := node.get(self._VALUES)) is not None:
+            yield 0, values
+        for depth, char in enumerate(message, 1):
+            if (node := node.get(char)) is None:
+                return
+            if (values := node.get(self._VALUES)) is not None:
+                yield depth, values
+
+    def longest(self, message: str) -> tuple[int, list[T]] | None:
+        """查找消息的最长指令前缀
+
+        Args:
+            message (str): 待匹配的消息
+
+        Returns:
+            tuple[int, list[T]] | None: (指令长度, 指令对应的值)，如果没有匹配则返回 None
+        """
+        node = self._root
+        hit = None
+        if (values := node.get(self._VALUES)) is not None:
+            hit = 0, values
+        for depth, char in enumerate(message, 1):
+            if (node := node.get(char)) is None:
+                break
+            if (values := node.get(self._VALUES)) is not None:
+                hit = depth, values
+        return hit
+
+
+class RegexMatcher[T]:
+    """合并正则匹配器
+
+    把多个正则合并为一个带命名分组的分支表达式，每条消息只需扫描一次。
+
+    分支按注册顺序尝试，命中第 i 个分支说明前 i 个正则都不匹配，
+    之后从第 i + 1 个分支继续扫描，直到找出全部匹配的正则。
+
+    分支每 BLOCK 个分为一块分别合并，避免大量正则时从各分支开始的合并正则编译开销随数量平方增长。
+
+    无法安全合并的正则会逐个匹配。
+    """
+
+    BLOCK = 64
+
+    def __init__(self, items: Iterable[tuple[re.Pattern[str], T]]):
+        self._fused: list[tuple[re.Pattern[str], T]] = []
+        self._fallback: list[tuple[re.Pattern[str], T]] = []
+        for pattern, value in items:
+            (self._fused if fusible(pattern) else self._fallback).append((pattern, value))
+        self._branches = [f"(?P<_{i}>{pattern.pattern})" for i, (pattern, _) in enumerate(self._fused)]
+        self._compiled: dict[int, re.Pattern[str]] = {}
+        if self._fused:
+            try:
+                for start in range(0, len(self._fused), self.BLOCK):
+                    self._suffix(start)
+            except re.error:
+                self._fallback[:0] = self._fused
+                self._fused.clear()
+                self._branches.clear()
+
+    def __bool__(self):
+        return bool(self._fused) or bool(self._fallback)
+
+    def _suffix(self, start: int) -> re.Pattern[str]:
+        """从第 start 个分支开始到所在块结尾的合并正则"""
+        if (pattern := self._compiled.get(start)) is None:
+            end = (start // self.BLOCK + 1) * self.BLOCK
+            pattern = self._compiled[start] = re.compile("|".join(self._branches[start:end]))
+        return pattern
+
+    def match(self, message: str) -> list[tuple[T, tuple[str | Any, ...]]]:
+        """匹配消息
+
+        Args:
+            message (str): 待匹配的消息
+
+        Returns:
+            list[tuple[T, tuple]]: (匹配的正则对应的值, 正则分组)
+        """
+        hits = []
+        start = 0
+        total = len(self._fused)
+        while start < total:
+            if (result := self._suffix(start).match(message)) is None:
+                start = (start // self.BLOCK + 1) * self.BLOCK
+                continue
+            name: str = result.lastgroup  # type: ignore
+            i = int(name[1:])
+            index = result.re.groupindex[name]
+            hits.append((self._fused[i][1], result.groups()[index : index + self._fused[i][0].groups]))
+            start = i + 1
+        for pattern, value in self._fallback:
+            if result := pattern.match(message):
+                hits.append((value, result.groups()))
+        return hits
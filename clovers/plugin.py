@@ -1,8 +1,13 @@
 import re
+import heapq
 import asyncio
+import inspect
+from itertools import count
 from typing import Any
-from collections.abc import Callable, Iterable, Sequence
+from collections.abc import Callable, Hashable, Iterable, Sequence
 from .base import Coro, Task, Info, Event, Result, EventHandler, BaseHandle
+from .matcher import CommandTrie
+from .executor import ExecutorKind, HandleExecutor
 
 type Matchable = str | Iterable[str] | re.Pattern[str] | None
 type RawEventHandler = Callable[[Any], Coro[Any | None]]
@@ -71,6 +76,9 @@ class Handle(BaseHandle):
         elif isinstance(command, Iterable):
             self.commands = sorted(set(command), key=lambda x: len(x))
             self.command = repr(self.commands)
+            self._trie = CommandTrie[str]()
+            for x in self.commands:
+                self._trie.insert(x, x)
             self.match = self.match_commands
         else:
             raise TypeError(f"Handle: {command} has an invalid type: {type(command)}")
@@ -84,9 +92,140 @@ class Handle(BaseHandle):
             return args.groups()
 
     def match_commands(self, message: str):
-        for command in self.commands:
-            if message.startswith(command):
-                return message.lstrip(command).split()
+        if (hit := self._trie.longest(message)) is not None:
+            return message[hit[0] :].split()
+
+
+class TempHandleTimer:
+    """临时任务计时器
+
+    全部临时任务共用一个按到期时间排序的最小堆，只在最早的到期时间注册一个 loop.call_at 回调。
+
+    延长任务只记录延长时长，在到期时重新入堆，不会创建新的任务。
+    """
+
+    def __init__(self) -> None:
+        self._heap: list[tuple[float, int, TempHandle]] = []
+        self._counter = count()
+        self._timer: asyncio.TimerHandle | None = None
+        self._stale: int = 0
+
+    def __len__(self):
+        return len(self._heap) - self._stale
+
+    def schedule(self, handle: "TempHandle", deadline: float):
+        """登记临时任务的到期时间
+
+        Args:
+            handle (TempHandle): 临时任务
+            deadline (float): 到期时间，以事件循环时间计
+        """
+        handle._seq = seq = next(self._counter)
+        heapq.heappush(self._heap, (deadline, seq, handle))
+        if self._timer is None or deadline < self._timer.when():
+            self._reset()
+
+    def discard(self):
+        """标记一个堆节点失效，失效节点过多时重建堆"""
+        self._stale += 1
+        if self._stale > 64 and self._stale * 2 > len(self._heap):
+            self._heap = [item for item in self._heap if item[1] == item[2]._seq]
+            heapq.heapify(self._heap)
+            self._stale = 0
+
+    def _reset(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        if self._heap:
+            self._timer = asyncio.get_running_loop().call_at(self._heap[0][0], self._expire)
+        else:
+            self._timer = None
+
+    def _expire(self):
+        self._timer = None
+        now = asyncio.get_running_loop().time()
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            _, seq, handle = heapq.heappop(heap)
+            if seq != handle._seq:
+                self._stale -= 1
+            elif handle._extension > 0.1:
+                deadline = now + handle._extension
+                handle._extension = -1.0
+                handle._seq = seq = next(self._counter)
+                heapq.heappush(heap, (deadline, seq, handle))
+            else:
+                handle.alive = False
+                handle._handles.discard(handle)
+        self._reset()
+
+    def close(self):
+        """取消计时并清空全部临时任务"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for _, _, handle in self._heap:
+            handle.alive = False
+            handle._handles.discard(handle)
+        self._heap.clear()
+        self._stale = 0
+
+
+class TempHandleRegistry:
+    """临时任务注册表
+
+    按路由键索引临时任务，一条消息只需要检查属于自己会话的临时任务和没有路由键的临时任务。
+
+    Attributes:
+        key (Callable[[dict], Hashable] | None): 根据事件参数计算消息的路由键
+    """
+
+    def __init__(self, key: Callable[[dict], Hashable] | None = None) -> None:
+        self.key = key
+        self._unkeyed: set[TempHandle] = set()
+        self._keyed: dict[Hashable, set[TempHandle]] = {}
+
+    def __iter__(self):
+        yield from self._unkeyed
+        for handles in self._keyed.values():
+            yield from handles
+
+    def __len__(self):
+        return len(self._unkeyed) + sum(map(len, self._keyed.values()))
+
+    def __contains__(self, handle: "TempHandle"):
+        if handle.key is None:
+            return handle in self._unkeyed
+        return handle.key in self._keyed and handle in self._keyed[handle.key]
+
+    def add(self, handle: "TempHandle"):
+        if handle.key is None:
+            self._unkeyed.add(handle)
+        else:
+            self._keyed.setdefault(handle.key, set()).add(handle)
+
+    def discard(self, handle: "TempHandle"):
+        if handle.key is None:
+            self._unkeyed.discard(handle)
+        elif (handles := self._keyed.get(handle.key)) is not None:
+            handles.discard(handle)
+            if not handles:
+                del self._keyed[handle.key]
+
+    def select(self, extra: dict) -> list["TempHandle"]:
+        """获取消息需要检查的临时任务
+
+        Args:
+            extra (dict): 事件参数
+
+        Returns:
+            list[TempHandle]: 没有路由键的临时任务与路由键相同的临时任务
+        """
+        if not self._keyed or self.key is None:
+            return list(self._unkeyed)
+        if (handles := self._keyed.get(self.key(extra))) is None:
+            return list(self._unkeyed)
+        return [*self._unkeyed, *handles]
 
 
 class TempHandle(BaseHandle):
@@ -97,48 +236,57 @@ class TempHandle(BaseHandle):
         func (EventHandler): 处理器函数
         properties (set[str]): 声明属性
         block (tuple[bool, bool]): 是否阻止后续插件, 是否阻止后续任务
+        key (Hashable | None): 路由键，为 None 时检查全部消息
     """
 
     def __init__(
         self,
         timeout: float | int,
-        temp_handles: set["TempHandle"],
+        temp_handles: TempHandleRegistry | set["TempHandle"],
         properties: Iterable[str],
         block: tuple[bool, bool],
         func: EventHandler,
         state: Any | None = None,
+        timer: TempHandleTimer | None = None,
+        key: Hashable | None = None,
     ):
         super().__init__(properties, block, func)
         self.state = state
+        self.key = key
+        self.alive: bool = False
         self._handles = temp_handles
+        self._timer = TempHandleTimer() if timer is None else timer
+        self._extension: float = -1.0
+        self._seq: int = -1
         self.delay(timeout)
 
     @property
     def info(self):
         return {"properties": self.properties, "block": self.block}
 
-    def __done_callback(self, *args):
-        self.__running_task = None
-        if self.__timeout > 0.1:
-            self.__running_task = asyncio.create_task(asyncio.sleep(self.__timeout))
-            self.__running_task.add_done_callback(self.__done_callback)
-            self.__timeout = -1.0
-        else:
-            self._handles.discard(self)
-
     def delay(self, timeout: float | int = 30.0):
-        """延长任务"""
-        self.__timeout = timeout
-        if self not in self._handles:
-            self._handles.add(self)
-            self.__done_callback()
+        """延长任务
+
+        任务原定到期时再延长 timeout 秒，已结束的任务会重新开始计时
+        """
+        if self.alive:
+            self._extension = timeout
+            return
+        if timeout <= 0.1:
+            return
+        self.alive = True
+        self._extension = -1.0
+        self._handles.add(self)
+        self._timer.schedule(self, asyncio.get_running_loop().time() + timeout)
 
     def finish(self):
         """结束任务"""
-        self.__timeout = -1.0
+        if not self.alive:
+            return
+        self.alive = False
+        self._seq = -1
         self._handles.discard(self)
-        if self.__running_task:
-            self.__running_task.cancel()
+        self._timer.discard()
 
 
 class Plugin[EventType](Info):
@@ -150,6 +298,7 @@ class Plugin[EventType](Info):
         block (bool, optional): 是否阻止后续任务. Defaults to False.
         build_event (EventBuilder, optional): 构建事件. Defaults to None.
         build_result (ResultBuilder, optional): 构建结果. Defaults to None.
+        temp_key (Callable[[dict], Hashable], optional): 根据事件参数计算临时任务路由键. Defaults to None.
         handles (set[Handle]): 已注册的响应器
         protocol (CloversProtocol): 同名类型协议
     """
@@ -161,6 +310,7 @@ class Plugin[EventType](Info):
         block: bool = True,
         build_event: EventBuilder | None = None,
         build_result: ResultBuilder | None = None,
+        temp_key: Callable[[dict], Hashable] | None = None,
     ) -> None:
 
         self.name: str = name
@@ -179,13 +329,17 @@ class Plugin[EventType](Info):
         """关闭任务列表"""
         self._handles: set[Handle] = set()
         """已注册的响应器"""
-        self.temp_handles: set[TempHandle] = set()
+        self.temp_handles = TempHandleRegistry(temp_key)
         """临时任务储存位置"""
+        self.temp_timer = TempHandleTimer()
+        """临时任务计时器"""
         self.require_plugins: set[str] = set()
         """依赖的插件"""
         self.protocol: type | None = None
         """类型协议"""
         self.is_started: bool = False
+        self.executor: HandleExecutor | None = None
+        """同步响应器的执行器，由 clovers 核心设置"""
 
     @property
     def info(self):
@@ -226,6 +380,7 @@ class Plugin[EventType](Info):
         if not self.is_started:
             return []
         self.is_started = False
+        self.temp_timer.close()
         return [asyncio.create_task(coro) for task in self._shutdown_tasklist if (coro := task())]
 
     class Rule[T]:
@@ -251,18 +406,34 @@ class Plugin[EventType](Info):
             else:
                 _checker = lambda event: all(checker(event) for checker in self._checker)
 
-            async def wrapper(event):
-                return await func(event) if _checker(event) else None
+            async def wrapper(event, *args):
+                return await func(event, *args) if _checker(event) else None
 
             return wrapper
 
-    def handle_wrapper(self, rule: Rule.Ruleable | Rule | None = None):
-        """构建插件的原始event->result响应"""
+    def handle_wrapper(self, rule: Rule.Ruleable | Rule | None = None, executor: ExecutorKind | None = None):
+        """构建插件的原始event->result响应
+
+        指定 executor 时 func 为同步响应器，在执行池中运行
+        """
 
         def decorator(func: RawEventHandler) -> EventHandler:
-            if rule:
-                func = rule.check(func) if isinstance(rule, self.Rule) else self.Rule(rule).check(func)
-            middle_func = func if (build_event := self.build_event) is None else lambda e: func(build_event(e))
+            rule_ = None if not rule else rule if isinstance(rule, self.Rule) else self.Rule(rule)
+            build_event = self.build_event
+            if executor == "process" and build_event is not None:
+                # 子进程接收原始事件的快照并在子进程中构建事件，规则仍在主进程检查构建后的事件
+                offloaded = self.offload(executor, func, build_event)
+                if rule_ is None:
+                    middle_func = offloaded
+                else:
+                    checked = rule_.check(lambda _, event: offloaded(event))
+                    middle_func = lambda e: checked(build_event(e), e)
+            else:
+                if executor is not None:
+                    func = self.offload(executor, func)
+                if rule_ is not None:
+                    func = rule_.check(func)
+                middle_func = func if build_event is None else lambda e: func(build_event(e))
             if not self.build_result:
                 return middle_func
             build_result = self.build_result
@@ -281,18 +452,28 @@ class Plugin[EventType](Info):
         rule: Rule[EventType].Ruleable | Rule[EventType] | None = None,
         priority: int = 0,
         block: bool | tuple[bool, bool] = True,
+        executor: ExecutorKind | None = None,
     ):
         """注册插件指令响应器
 
+        指定 executor 时响应器为同步函数，在 clovers 核心管理的线程池或进程池中运行。
+
+        使用进程池时响应器与 build_event 须为模块顶层定义，子进程收到的事件只包含消息、指令参数与已获取的属性，不能调用适配器方法，
+
+        设置了 build_event 时事件在子进程中由这份快照构建。
+
         Args:
             command (Matchable): 指令
             properties (Iterable[str]): 声明需要额外参数
             rule (Rule.Ruleable | Rule | None): 响应规则
             priority (int): 优先级
             block (bool | tuple[bool, bool]): 是否阻断后续响应器
+            executor (ExecutorKind | None): 同步响应器的执行池类型
         """
         if self.is_started:
             raise RuntimeError("Cannot register handle after plugin started")
+        if executor not in (None, "thread", "process"):
+            raise ValueError(f"Invalid executor: {executor}")
 
         def decorator(func: RawEventHandler):
             handle = Handle(
@@ -300,13 +481,36 @@ class Plugin[EventType](Info):
                 properties,
                 priority,
                 (self.block, block) if isinstance(block, bool) else block,
-                self.handle_wrapper(rule)(func),
+                self.handle_wrapper(rule, executor)(func),
             )
+            handle.plugin = self
             self._handles.add(handle)
-            return handle.func
+            # 同步响应器原样返回，进程池按模块属性 pickle 响应器
+            return handle.func if executor is None else func
 
         return decorator
 
+    def offload(self, executor: ExecutorKind, func: Callable[[Any], Any], build_event: EventBuilder | None = None) -> RawEventHandler:
+        """把同步响应器包装为在执行池中运行的协程函数
+
+        Args:
+            executor (ExecutorKind): 执行池类型
+            func (Callable[[Any], Any]): 同步响应器
+            build_event (EventBuilder | None): 在执行池中构建事件，此时包装后的函数接收原始事件
+        """
+        if inspect.iscoroutinefunction(func):
+            raise TypeError(f"Handle with executor must be a sync function: {func.__qualname__}")
+
+        async def wrapper(event):
+            if self.executor is None:
+                raise RuntimeError(f'Plugin "{self.name}" is not attached to a clovers core')
+            if executor == "process":
+                # 跨进程只传递消息、指令参数与已获取的属性
+                event = Event(event.message, event.args, dict(event.properties), None, {})  # type: ignore
+            return await self.executor.run(executor, func, event, build_event)
+
+        return wrapper
+
     def temp_handle(
         self,
         properties: Iterable[str] = [],
@@ -314,6 +518,7 @@ class Plugin[EventType](Info):
         rule: Rule[EventType].Ruleable | Rule[EventType] | None = None,
         block: bool | tuple[bool, bool] = True,
         state: Any | None = None,
+        key: Hashable | None = None,
     ):
         """创建插件临时响应器
 
@@ -323,7 +528,10 @@ class Plugin[EventType](Info):
             rule (Rule.Ruleable | Rule | None): 响应规则
             block (bool | tuple[bool, bool]): 是否阻断后续响应器
             state (Any | None): 传递给临时指令的额外参数
+            key (Hashable | None): 路由键，只响应 temp_key 计算结果相同的消息，为 None 时响应全部消息
         """
+        if key is not None and self.temp_handles.key is None:
+            raise ValueError(f'Plugin "{self.name}" has no temp_key, temp handle key {key!r} would never match')
 
         def decorator(func: RawTempEventHandler):
             handle = TempHandle(
@@ -333,7 +541,10 @@ class Plugin[EventType](Info):
                 (self.block, block) if isinstance(block, bool) else block,
                 self.handle_wrapper(rule)(lambda e: func(e, handle)),
                 state,
+                self.temp_timer,
+                key,
             )
+            handle.plugin = self
             return handle.func
 
         return decorator
@@ -0,0 +1,47 @@
+import sys
+import timeit
+from pathlib import Path
+from functools import wraps
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from clovers.base import kwfilter
+
+
+def legacy_kwfilter(func):
+    """0.5.1 的参数过滤器，用于对比"""
+
+    if func.__code__.co_flags & 0x0C:
+        return func
+    co_argcount = func.__code__.co_argcount
+    if co_argcount == 0:
+        return wraps(func)(lambda *args, **kwargs: func())
+    kw = set(func.__code__.co_varnames[:co_argcount])
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return func(*args, **{k: v for k, v in kwargs.items() if k in kw})
+
+    return wrapper
+
+
+async def send(message: str, recv: dict, client: object): ...
+async def call(user_id: str, /, recv: dict, client: object) -> str: ...
+async def prop(recv: dict) -> str: ...
+
+
+extra = {"recv": {}, "client": object(), "bot_id": "0", "message_id": "0", "group_id": "0", "sender_id": "0", "raw": b""}
+NUMBER = 200000
+
+cases = {
+    "send": (send, ("message",)),
+    "call": (call, ("user_id",)),
+    "property": (prop, ()),
+}
+
+if __name__ == "__main__":
+    for name, (func, args) in cases.items():
+        for label, builder in (("legacy", legacy_kwfilter), ("current", kwfilter)):
+            wrapped = builder(func)
+            cost = timeit.timeit(lambda: wrapped(*args, **extra).close(), number=NUMBER)
+            print(f"{name:<10}{label:<10}{cost / NUMBER * 1e9:8.1f} ns/call")
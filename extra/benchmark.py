@@ -0,0 +1,189 @@
+"""dispatch 性能基准
+
+    python extra/benchmark.py --output result.json
+    python extra/benchmark.py --compare result.json
+
+每个场景先预热，再顺序派发消息测量单条延迟（p50/p99），最后并发派发测量吞吐量（条/秒）。
+"""
+
+import sys
+import json
+import random
+import asyncio
+import argparse
+import platform
+from pathlib import Path
+from time import perf_counter
+from statistics import quantiles
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import clovers
+from clovers import Adapter, CloversCore, CloversMultiCore, Plugin, Result
+
+
+class Core(CloversCore):
+    def extract_message(self, **extra):
+        return extra.get("message")
+
+
+class MultiCore(CloversMultiCore):
+    def locate_core(self, **extra):
+        return self.cores[hash(extra["user_id"]) % len(self.cores)]
+
+
+def build_adapter(properties: int) -> Adapter:
+    adapter = Adapter("bench")
+
+    @adapter.send_method("text")
+    async def _(message: str, user_id: str): ...
+
+    for i in range(properties):
+        adapter.property_method(f"prop{i}")(lambda user_id, i=i: asyncio.sleep(0, f"{user_id}-{i}"))
+    return adapter
+
+
+def build_core(scenario: str, handles: int, properties: int = 0) -> Core:
+    core = Core("bench")
+    core.adapter.mixin(build_adapter(properties))
+    plugin = Plugin("bench", build_result=lambda r: Result("text", r), temp_key=lambda extra: extra["user_id"])
+
+    async def reply(event):
+        return "ok"
+
+    for i in range(handles):
+        match scenario:
+            case "prefix" | "temp":
+                plugin.handle([f"cmd{i}", f"指令{i}"])(reply)
+            case "regex":
+                plugin.handle(rf"^cmd{i}\s+(\d+)$")(reply)
+            case "catchall":
+                plugin.handle(None, block=False)(reply)
+            case "properties":
+                plugin.handle([f"cmd{i}"], [f"prop{j}" for j in range(properties)])(reply)
+    core.plugins.append(plugin)
+    return core
+
+
+def messages(scenario: str, handles: int, count: int) -> list[str]:
+    rng = random.Random(0)
+    match scenario:
+        case "regex":
+            return [f"cmd{rng.randrange(handles)} {i}" for i in range(count)]
+        case "catchall":
+            return [f"message {i}" for i in range(count)]
+        case _:
+            # 一成消息不触发任何响应器
+            return [f"cmd{rng.randrange(handles)} arg" if i % 10 else f"miss {i}" for i in range(count)]
+
+
+async def measure(dispatch, extras: list[dict], concurrency: int) -> dict:
+    # 预热，正则的合并表达式在第一次命中时编译
+    await asyncio.gather(*(task for extra in extras if (task := dispatch(**extra)) is not None))
+    latencies = []
+    for extra in extras:
+        start = perf_counter()
+        if (task := dispatch(**extra)) is not None:
+            await task
+        latencies.append(perf_counter() - start)
+    start = perf_counter()
+    for i in range(0, len(extras), concurrency):
+        await asyncio.gather(*(task for extra in extras[i : i + concurrency] if (task := dispatch(**extra)) is not None))
+    cost = perf_counter() - start
+    cuts = quantiles(latencies, n=100)
+    return {"throughput": len(extras) / cost, "p50": cuts[49], "p99": cuts[98]}
+
+
+async def run_single(scenario: str, handles: int, count: int, concurrency: int, temp: int = 0, properties: int = 0) -> dict:
+    core = build_core(scenario, handles, properties)
+    extras = [{"message": message, "user_id": f"u{i % 100}"} for i, message in enumerate(messages(scenario, handles, count))]
+    async with core:
+        plugin = next(iter(core.plugins))
+        for i in range(temp):
+
+            @plugin.temp_handle(timeout=3600, key=f"u{i}")
+            async def _(event, handle):
+                return None
+
+        return await measure(core.dispatch, extras, concurrency)
+
+
+async def run_multi(cores: int, handles: int, count: int, concurrency: int) -> dict:
+    multi = MultiCore(*(build_core("prefix", handles) for _ in range(cores)))
+    extras = [{"message": message, "user_id": f"u{i % 100}"} for i, message in enumerate(messages("prefix", handles, count))]
+
+    def dispatch(**extra):
+        core = multi.locate_core(**extra)
+        return core.dispatch(**extra) if core is not None else None
+
+    async with multi:
+        return await measure(dispatch, extras, concurrency)
+
+
+def cases(sizes: list[int]):
+    for size in sizes:
+        yield {"scenario": "prefix", "handles": size}
+        yield {"scenario": "regex", "handles": size}
+    for size in sizes:
+        if size <= 1000:
+            yield {"scenario": "catchall", "handles": size}
+    for temp in (0, 100, 10000):
+        yield {"scenario": "temp", "handles": 100, "temp": temp}
+    for properties in (1, 4, 16):
+        yield {"scenario": "properties", "handles": 100, "properties": properties}
+    for cores in (1, 4):
+        yield {"scenario": "multicore", "handles": 100, "cores": cores}
+
+
+async def main(args: argparse.Namespace) -> list[dict]:
+    results = []
+    for case in cases(args.sizes):
+        if case["scenario"] == "multicore":
+            stats = await run_multi(case["cores"], case["handles"], args.messages, args.concurrency)
+        else:
+            options = {k: v for k, v in case.items() if k in ("temp", "properties")}
+            stats = await run_single(case["scenario"], case["handles"], args.messages, args.concurrency, **options)
+        result = {**case, **stats}
+        results.append(result)
+        label = " ".join(f"{k}={v}" for k, v in case.items())
+        print(f"{label:<48}{stats['throughput']:>12.0f} msg/s  p50 {stats['p50'] * 1e6:>9.1f}us  p99 {stats['p99'] * 1e6:>9.1f}us")
+    return results
+
+
+def case_key(result: dict):
+    return tuple(sorted((k, v) for k, v in result.items() if k not in ("throughput", "p50", "p99")))
+
+
+def compare(results: list[dict], path: str):
+    baseline = {case_key(x): x for x in json.loads(Path(path).read_text(encoding="utf8"))["results"]}
+    print(f"\ncompared with {path}")
+    for result in results:
+        if (old := baseline.get(case_key(result))) is None:
+            continue
+        label = " ".join(f"{k}={v}" for k, v in case_key(result))
+        throughput = result["throughput"] / old["throughput"] - 1
+        p99 = result["p99"] / old["p99"] - 1
+        print(f"{label:<48}throughput {throughput:>+8.1%}  p99 {p99:>+8.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="clovers dispatch benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000], help="handle counts")
+    parser.add_argument("--messages", type=int, default=2000, help="messages per case")
+    parser.add_argument("--concurrency", type=int, default=100, help="messages dispatched at once when measuring throughput")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", help="compare with a previous JSON result")
+    args = parser.parse_args()
+    results = asyncio.run(main(args))
+    report = {
+        "clovers": clovers.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "messages": args.messages,
+        "concurrency": args.concurrency,
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf8")
+    if args.compare:
+        compare(results, args.compare)